@@ -4,7 +4,6 @@ from __future__ import annotations
 
 __author__ = "Charles Mesa Cayobit"
 
-import os
 import subprocess
 from collections.abc import Sequence
 from pathlib import Path
@@ -13,9 +12,12 @@ from typing import NoReturn
 
 import maya.cmds as cmds
 
+import rec.modules.files.manifest as fmanifest
 import rec.modules.files.names as fname
+import rec.modules.helpers as mhelpers
 import rec.modules.maya as mapp
 import rec.modules.maya.objects as mobj
+import rec.modules.workers as mworkers
 
 _SUBPROCESS_SCRIPT_FILENAME = "export_mayaBinary.py"
 _SUBPROCESS_SCRIPT_PATH = Path(__file__).with_name(_SUBPROCESS_SCRIPT_FILENAME)
@@ -53,13 +55,50 @@ def getComponents(
     return lookAt, xform, camera, locator, locatorShape
 
 
+def _getHelpersDir() -> Path:
+    return Path(cmds.internalVar(userAppDir=True), "rec_helpers", "mayaBinary")
+
+
+DEFAULT_HELPER_COUNT = 2
+_HELPER_TIMEOUT = 60.0  # Seconds to wait for an export before starting Maya
+
+_helpers: list[subprocess.Popen[bytes]] = []
+
+
+def startHelpers(count: int = DEFAULT_HELPER_COUNT) -> None:
+    """Start Mayas in the background, ready to export binary files
+
+    Start them ahead of the first export, e.g. when the shelf loads, so no
+    export waits for Maya to start. Helpers of other Maya sessions count
+    towards the pool. They quit after being idle for a while.
+    """
+
+    global _helpers
+    _helpers = [h for h in _helpers if h.poll() is None]
+    running = {h.pid for h in _helpers}
+    running |= mhelpers.getHelperPids(_getHelpersDir())
+    for _ in range(count - len(running)):
+        helper = mhelpers.start(
+            (
+                mworkers.getMayapyPath(),
+                _SUBPROCESS_SCRIPT_PATH,
+                "--serve",
+                _getHelpersDir(),
+            )
+        )
+        _helpers.append(helper)
+
+
 def _exportMayaAsciiThenBinary(
     nodes: Sequence[mobj.DGNode], binaryFilePath: Path
 ) -> None:
     """Export the nodes to a temporary ASCII file before a binary one
 
-    The nodes exported to an ASCII file in a temporary directory. Then, another
-    instance of Maya is opened to export the nodes into a binary file.
+    The nodes exported to an ASCII file in a temporary directory. Then, an
+    idle Maya in the background, see `startHelpers`, exports the nodes into a
+    binary file. If none is idle, or it fails or takes too long, another
+    instance of Maya is opened to export them. Either way, the pool is topped
+    up for next time.
     """
 
     prefix = f"{fname.SHOW}_"
@@ -69,9 +108,24 @@ def _exportMayaAsciiThenBinary(
 
         mobj.export(nodes, filePath=asciiFilePath, fileType=mapp.FileType.ASCII)
 
-        mayapy = os.path.join(os.environ["MAYA_LOCATION"], "bin", "mayapy")
+        request = {
+            "maPath": asciiFilePath.as_posix(),
+            "mbPath": binaryFilePath.as_posix(),
+            "nodes": list(nodes),
+        }
+        try:
+            handled, _ = mhelpers.request(
+                _getHelpersDir(), request=request, timeout=_HELPER_TIMEOUT
+            )
+        except mhelpers.HelperError as e:
+            print("", "Helper failed, exporting in a new Maya", e, sep="\n")
+            handled = False
+        if handled:
+            startHelpers()
+            return
+
         args = (
-            mayapy,
+            mworkers.getMayapyPath(),
             _SUBPROCESS_SCRIPT_PATH,
             asciiFilePath,
             binaryFilePath,
@@ -87,12 +141,21 @@ def _exportMayaAsciiThenBinary(
         results.stderr,
         sep="\n",
     )
+    startHelpers()
 
 
 def export(cameraNodes: Sequence[mobj.DAGNode], filePath: Path) -> None:
-    """If unknown nodes are present, temporarily export to an ASCII file"""
+    """If unknown nodes are present, temporarily export to an ASCII file
+
+    The exported file is recorded in the manifest.
+    """
 
     if mobj.lsUnknown():
         _exportMayaAsciiThenBinary(cameraNodes, binaryFilePath=filePath)
-        return
-    mobj.export(cameraNodes, filePath=filePath, fileType=mapp.FileType.BINARY)
+    else:
+        mobj.export(
+            cameraNodes, filePath=filePath, fileType=mapp.FileType.BINARY
+        )
+    fmanifest.record(
+        filePath, frameRange=mapp.getPlaybackRange(), nodes=cameraNodes
+    )
@@ -0,0 +1,43 @@
+"""Export from a snapshot of an artist's scene, as a background job"""
+
+__author__ = "Charles Mesa Cayobit"
+
+import importlib
+import json
+import sys
+import traceback
+from argparse import ArgumentParser
+from pathlib import Path
+
+import maya.cmds as cmds
+
+import rec.modules.maya as mapp
+import rec.modules.maya.background as mbackground
+
+
+def main(jobDir: Path) -> int:
+    job = json.loads((jobDir / mbackground.JOB_FILENAME).read_text("utf-8"))
+    function = job["function"]
+    try:
+        mbackground.writeStatus(jobDir, mbackground.RUNNING, "Opening scene")
+        cmds.file(job["scene"], open=True, force=True)
+
+        mbackground.writeStatus(jobDir, mbackground.RUNNING, f"{function}")
+        module = importlib.import_module(job["module"])
+        getattr(module, function)(**job["kwargs"])
+    except Exception as e:
+        traceback.print_exc()
+        mbackground.writeStatus(jobDir, mbackground.FAILED, f"{e!r}")
+        return 1
+    mbackground.writeStatus(jobDir, mbackground.DONE)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("jobDir", type=Path)
+    args = parser.parse_args()
+
+    with mapp.Standalone():
+        returncode = main(args.jobDir)
+    sys.exit(returncode)
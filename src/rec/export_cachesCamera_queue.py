@@ -3,7 +3,8 @@
 
 __author__ = "Charles Mesa Cayobit"
 
-import shutil
+import sys
+from argparse import SUPPRESS, ArgumentParser
 from pathlib import Path
 
 import maya.cmds as cmds
@@ -15,50 +16,101 @@ import rec.modules.files.paths as fpath
 import rec.modules.maya as mapp
 import rec.modules.maya.objects as mobj
 import rec.modules.queue as mqueue
+import rec.modules.workers as mworkers
 
 _SCRIPTS_DIR = Path(__file__).parents[1]
-_EXPORT_QUEUE = _SCRIPTS_DIR / "__cache_queue.txt"
+_EXPORT_QUEUE = _SCRIPTS_DIR / "__cache_queue.jsonl"
+_LEGACY_EXPORT_QUEUE = _SCRIPTS_DIR / "__cache_queue.txt"
+_LOGS_DIR = _SCRIPTS_DIR / "logs"
 
 
-def main() -> None:
-    # Backup the queue
+def exportShot(scene: Path) -> None:
+    """Export the Mechanic geometry cache of a shot's scene"""
 
-    shutil.copy(_EXPORT_QUEUE, f"{_EXPORT_QUEUE}~")
+    shot = fname.ShotId.fromFilename(scene.stem)
+    shotDir = fpath.findShotPath(shot, parentDir=fpath.findSharedDrive())
+    cachesDir = shotDir / fpath.CACHES_DIR
 
-    queue = mqueue.readTxt(_EXPORT_QUEUE)
+    mechanicFilename = rec.geometryCache.constructFilename(
+        dir=cachesDir,
+        shot=shot,
+        assetName=fname.AssetName.MECHANIC,
+        assetType=fname.AssetType.CACHE,
+    )
 
-    while queue:
-        scene = Path(queue.popleft())
+    print(
+        "",
+        f"Exporting {shot} Mechanic geometry cache to:",
+        cachesDir,
+        "",
+        sep="\n",
+    )
 
-        shot = fname.ShotId.fromFilename(scene.stem)
-        shotDir = fpath.findShotPath(shot, parentDir=fpath.findSharedDrive())
-        cachesDir = shotDir / fpath.CACHES_DIR
+    cmds.file(scene, open=True)
+    rec.geometryCachesCamera.exportGeometryCache(
+        mobj.MECHANIC_MODEL_GEO_GRP,
+        dir=cachesDir,
+        filename=mechanicFilename,
+    )
 
-        mechanicFilename = rec.geometryCache.constructFilename(
-            dir=cachesDir,
-            shot=shot,
-            assetName=fname.AssetName.MECHANIC,
-            assetType=fname.AssetType.CACHE,
-        )
 
-        print(
-            "",
-            f"Exporting {shot} Mechanic geometry cache to:",
-            cachesDir,
-            "",
-            sep="\n",
-        )
+def _openQueue() -> mqueue.JobQueue:
+    queue = mqueue.JobQueue(_EXPORT_QUEUE)
+    queue.absorbTxt(_LEGACY_EXPORT_QUEUE)
+    queue.requeueExpired()  # Of earlier runs that were killed
+    return queue
 
-        cmds.file(scene, open=True)
-        rec.geometryCachesCamera.exportGeometryCache(
-            mobj.MECHANIC_MODEL_GEO_GRP,
-            dir=cachesDir,
-            filename=mechanicFilename,
-        )
 
-        mqueue.updateTxt(_EXPORT_QUEUE, queue=queue)
+def main() -> None:
+    queue = _openQueue()
+    owner = mqueue.getOwner()
+    with queue.lease(owner):
+        while (job := queue.claim(owner=owner)) is not None:
+            try:
+                exportShot(Path(job.item))
+            except Exception as e:
+                queue.fail(job.id, reason=f"{e}", owner=owner)
+                raise
+            queue.ack(job.id, owner=owner)
+
+
+def mainInParallel(workers: int, retries: int) -> bool:
+    """Export the queued shots in parallel mayapy processes, one shot each"""
+    return mworkers.runSceneQueue(
+        _openQueue(),
+        script=__file__,
+        logsDir=_LOGS_DIR,
+        logSuffix="cacheQueue",
+        label="caches",
+        maxWorkers=workers,
+        retries=retries,
+    )
 
 
 if __name__ == "__main__":
-    with mapp.Standalone():
-        main()
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of shots to export at once in separate mayapy processes",
+    )
+    parser.add_argument(
+        "-r",
+        "--retries",
+        type=int,
+        default=1,
+        help="Times to retry a shot whose worker failed or crashed",
+    )
+    parser.add_argument("--scene", type=Path, help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scene is not None:
+        with mapp.Standalone():
+            exportShot(args.scene)
+    elif args.workers > 1:
+        sys.exit(0 if mainInParallel(args.workers, args.retries) else 1)
+    else:
+        with mapp.Standalone():
+            main()
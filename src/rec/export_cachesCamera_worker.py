@@ -0,0 +1,37 @@
+"""Export one asset of a shot, as a worker of a parallel export"""
+
+__author__ = "Charles Mesa Cayobit"
+
+from argparse import ArgumentParser
+from pathlib import Path
+
+import maya.cmds as cmds
+
+import rec.geometryCachesCamera
+import rec.modules.maya as mapp
+import rec.modules.progress as mprogress
+
+
+def main(
+    scene: Path,
+    cachesDir: Path,
+    asset: rec.geometryCachesCamera.Asset,
+    filename: str,
+) -> None:
+    cmds.file(scene.as_posix(), open=True, force=True)
+    with mapp.FrameProgress(mprogress.emit):
+        rec.geometryCachesCamera.exportAsset(
+            asset, dir=cachesDir, filename=filename
+        )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("scene", type=Path)
+    parser.add_argument("cachesDir", type=Path)
+    parser.add_argument("asset", type=rec.geometryCachesCamera.Asset)
+    parser.add_argument("filename")
+    args = parser.parse_args()
+
+    with mapp.Standalone():
+        main(args.scene, args.cachesDir, args.asset, args.filename)
@@ -1,71 +1,200 @@
 from __future__ import annotations
 
+import array
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import tempfile
 from collections.abc import Callable, Sequence
+from pathlib import Path
 from typing import Any, Literal
 
+import maya.api.OpenMaya as om
+import maya.app.renderSetup.model.renderLayer as renderLayer
+import maya.app.renderSetup.model.renderSetup as renderSetup
+import maya.app.renderSetup.model.typeIDs as typeIDs
 import maya.cmds as cmds
 import maya.mel as mel
 
 import rec.camera
 import rec.modules.files.names as fname
 import rec.modules.files.paths as fpath
+import rec.modules.files.sequences as fseq
+import rec.modules.frames as mframes
 import rec.modules.maya as mapp
 import rec.modules.maya.objects as mobj
 import rec.modules.maya.ui as mui
+import rec.modules.timing as mtiming
 import rec.renderSettings
 
 WINDOW_TITLE = "Mask Exporter"
 WINDOW_NAME = "maskWindow"
 
+MASKS_LAYER = "MASKS"
+# Colors of the masks exported in one pass, each in its own channel
+MASK_CHANNELS = (1, 0, 0), (0, 1, 0), (0, 0, 1)
+# Color of a mask rendered on its own, as white on black
+ALPHA_COLORS = ((1, 1, 1),)
+
+# What each frame's mask is made from, besides the geometry
+_CAMERA_ATTRIBUTES = (
+    "worldMatrix",
+    "focalLength",
+    "horizontalFilmAperture",
+    "verticalFilmAperture",
+)
+
 
 class _Mask:
-    __slots__ = "target", "origShaderConnections"
+    """Temporarily shade the target white, and everything else black
+
+    Every shading engine's shader is swapped in one graph edit, which is
+    undone to restore the scene's shaders exactly. Creating the mask shaders
+    is a single undo chunk.
+    """
+
+    __slots__ = "target", "_undo"
 
     def __init__(self, target: mobj.DAGNode | Sequence[mobj.DAGNode]) -> None:
         self.target = target
         print(self.target)
-
-        self.origShaderConnections: dict[str, str] = {}
-        for m in cmds.ls(type="shadingEngine"):
-            if shader := cmds.listConnections(f"{m}.surfaceShader", plugs=True):
-                self.origShaderConnections[m] = shader[0]
+        self._undo: mobj.Undo | None = None
 
     def __enter__(self) -> None:
-        if mobj.ROBOT_MODEL_GEO_GRP[1:] in self.target:
-            cmds.setAttr(f"{mobj.ROBOT_FACE_MODEL_GEO}.visibility", False)
+        cmds.undoInfo(openChunk=True, chunkName=f"{fname.SHOW}_mask")
+        try:
+            black = self._create("black", colorRgb=(0, 0, 0))
+            white = self._create("white", colorRgb=(1, 1, 1))
 
-        self._create("black", colorRgb=(0, 0, 0))
-        self._create("white", colorRgb=(1, 1, 1), target=self.target)
+            shaders = dict.fromkeys(
+                _lsShadingEngines(cmds.ls(type="dagNode")), black
+            )
+            shaders.update(dict.fromkeys(_lsShadingEngines(self.target), white))
+            values: dict[str, bool] = {}
+            if mobj.ROBOT_MODEL_GEO_GRP[1:] in self.target:
+                faces = cmds.ls(mobj.ROBOT_FACE_MODEL_GEO)
+                values = {f"{f}.visibility": False for f in faces}
+
+            self._undo = mobj.edit(
+                [
+                    (f"{shader}.outColor", f"{sg}.surfaceShader")
+                    for sg, shader in shaders.items()
+                ],
+                values=values,
+            )
+        except:
+            cmds.undoInfo(closeChunk=True)
+            raise
 
     def __exit__(self, *args: Any) -> None:
-        if self.target is mobj.ROBOT_MODEL_GEO_GRP:
-            cmds.setAttr(f"{mobj.ROBOT_FACE_MODEL_GEO}.visibility", True)
-
-        for k, v in self.origShaderConnections.items():
-            try:
-                cmds.connectAttr(v, f"{k}.surfaceShader", force=True)
-            except RuntimeError:
-                continue
+        try:
+            if self._undo is not None:
+                self._undo()
+                self._undo = None
+        finally:
+            cmds.undoInfo(closeChunk=True)
 
     def _create(
         self,
         colorLabel: Literal["black"] | Literal["white"],
         colorRgb: Sequence[float],
-        target: mobj.DAGNode | Sequence[mobj.DAGNode] | None = None,
-    ) -> None:
+    ) -> mobj.DGNode:
         lambert = f"mask_{colorLabel}_lam"
         if not mobj.nodeExists(lambert, "lambert"):
             cmds.shadingNode("lambert", name=lambert, asShader=True)
         cmds.setAttr(f"{lambert}.color", *colorRgb, type="float3")
         cmds.setAttr(f"{lambert}.diffuse", colorRgb[0])
+        return lambert
+
+
+def _lsShadingEngines(
+    nodes: mobj.DAGNode | Sequence[mobj.DAGNode],
+) -> list[mobj.DGNode]:
+    """List the shading engines of every shape under the nodes"""
+
+    shapes = mobj.lsChildren(nodes, allDescendents=True, type="shape")
+    if not shapes:
+        return []
+    return cmds.listConnections(shapes, type="shadingEngine") or []
+
+
+def _createSurfaceShader(name: str, colorRgb: Sequence[float]) -> mobj.DGNode:
+    if not mobj.nodeExists(name, "surfaceShader"):
+        cmds.shadingNode("surfaceShader", name=name, asShader=True)
+    cmds.setAttr(f"{name}.outColor", *colorRgb, type="float3")
+    return name
 
-        if target is None:
-            target = cmds.ls(type="dagNode")
-        shapes = mobj.lsChildren(target, allDescendents=True, type="shape")
-        for sg in frozenset(cmds.listConnections(shapes, type="shadingEngine")):
-            cmds.connectAttr(
-                f"{lambert}.outColor", f"{sg}.surfaceShader", force=True
+
+class _MaskLayer:
+    """Temporary render setup layer that shades each mask in its own channel
+
+    Everything else is black, so up to three masks are exported at once,
+    e.g. the Mechanic in red and the Robot in green. The live scene's shaders
+    aren't touched: the layer's shader overrides are applied when it's made
+    visible, and it's deleted afterwards.
+    """
+
+    __slots__ = "masks", "colors", "_layer", "_origLayer"
+
+    def __init__(
+        self,
+        masks: dict[str, mobj.DAGNode | Sequence[mobj.DAGNode]],
+        colors: Sequence[Sequence[float]] = MASK_CHANNELS,
+    ) -> None:
+        if len(masks) > len(colors):
+            raise ValueError(f"At most {len(colors)} masks in one pass")
+        self.masks = masks
+        self.colors = colors
+
+    def __enter__(self) -> None:
+        rs = renderSetup.instance()
+        self._origLayer = rs.getVisibleRenderLayer()
+        with contextlib.suppress(Exception):
+            renderLayer.delete(rs.getRenderLayer(MASKS_LAYER))  # Left over
+        self._layer = layer = rs.createRenderLayer(MASKS_LAYER)
+
+        everything = layer.createCollection(f"{MASKS_LAYER}_all")
+        everything.getSelector().setPattern("*")
+        black = _createSurfaceShader("mask_black_ss", colorRgb=(0, 0, 0))
+        override = everything.createOverride(
+            "mask_black_ovr", typeIDs.shaderOverride
+        )
+        override.setShader(black)
+
+        # Later collections override earlier ones
+        for (label, geometry), rgb in zip(self.masks.items(), self.colors):
+            shapes = mobj.lsChildren(
+                geometry, allDescendents=True, type="shape"
+            )
+            collection = layer.createCollection(f"{MASKS_LAYER}_{label}")
+            collection.getSelector().setStaticSelection(" ".join(shapes))
+            shader = _createSurfaceShader(f"mask_{label}_ss", colorRgb=rgb)
+            override = collection.createOverride(
+                f"mask_{label}_ovr", typeIDs.shaderOverride
             )
+            override.setShader(shader)
+
+        if faces := self._lsHiddenFaces():
+            collection = layer.createCollection(f"{MASKS_LAYER}_hidden")
+            collection.getSelector().setStaticSelection(" ".join(faces))
+            for face in faces:
+                override = collection.createAbsoluteOverride(face, "visibility")
+                override.setAttrValue(False)
+
+        rs.switchToLayer(layer)
+
+    def __exit__(self, *args: Any) -> None:
+        renderSetup.instance().switchToLayer(self._origLayer)
+        renderLayer.delete(self._layer)
+
+    def _lsHiddenFaces(self) -> list[mobj.DAGNode]:
+        """Hide the Robot's face when masking the Robot, like `_Mask` does"""
+        if "RB" not in self.masks:
+            return []
+        return cmds.ls(mobj.ROBOT_FACE_MODEL_GEO)
 
 
 class _InputWindow(mui.Window):
@@ -139,12 +268,7 @@ class _InputWindow(mui.Window):
         return input.upper()
 
 
-@mapp.SuspendedRedraw()
-def _main(
-    shot: fname.ShotId,
-    geometry: mobj.DAGNode | Sequence[mobj.DAGNode],
-    label: str,
-) -> None:
+def _findCamera() -> mobj.DAGNode:
     try:
         camera = rec.camera.getComponents(mobj.TopLevelGroup.CAMERA)
     except mobj.TopLevelGroupDoesNotExistError:
@@ -153,39 +277,289 @@ def _main(
         raise RuntimeError("No camera in scene")
     for c in camera:
         if cmds.objectType(c, isType="camera"):
-            camera = c
-            break
+            return c
+    return camera  # type: ignore
+
+
+@mapp.SuspendedRedraw()
+def _main(
+    shot: fname.ShotId,
+    geometry: mobj.DAGNode | Sequence[mobj.DAGNode],
+    label: str,
+) -> None:
+    camera = _findCamera()
 
     exportDir = fpath.findSharedDrive()
     filename = f"{shot.name}_{label}_alpha".upper()
     filePath = exportDir / filename
 
+    ui = mui.ProgressWindow("progressWindow", WINDOW_TITLE)
+    ui.build().initialize(f"Exporting {filename} to:\n{exportDir}").update()
+    ui.show()
+
     resolutionWidth = cmds.getAttr("defaultResolution.width")
     resolutionHeight = cmds.getAttr("defaultResolution.height")
     with _Mask(geometry), rec.renderSettings.Playblast() as viewport:
         cmds.lookThru(viewport, camera)  # type: ignore
-        cmds.playblast(
-            clearCache=True,
-            compression="h.264",
-            filename=filePath.as_posix(),
-            # filename=os.path.join("/Users/charles_mc/Desktop", filename),
-            forceOverwrite=True,
-            format="qt",
-            percent=100,
-            quality=100,
-            sequenceTime=False,
-            showOrnaments=False,
-            viewer=False,
-            widthHeight=(resolutionWidth, resolutionHeight),
-        )
+        with mapp.FrameProgress(ui.reportFrames):
+            cmds.playblast(
+                clearCache=True,
+                compression="h.264",
+                filename=filePath.as_posix(),
+                # filename=os.path.join("/Users/charles_mc/Desktop", filename),
+                forceOverwrite=True,
+                format="qt",
+                percent=100,
+                quality=100,
+                sequenceTime=False,
+                showOrnaments=False,
+                viewer=False,
+                widthHeight=(resolutionWidth, resolutionHeight),
+            )
+    ui.update().close()
+
+
+def _hashFrames(
+    camera: mobj.DAGNode, frameRange: mframes.FrameRange, salt: str
+) -> dict[int, str]:
+    """Hash what each frame's mask is made from
+
+    That's the camera and every visible mesh's points, as evaluated from
+    their geometry caches. The salt is hashed too, for what every frame
+    depends on, e.g. the masks and resolution.
+
+    The points are read in bulk with OpenMaya, since querying them with
+    `cmds.xform` is too slow for every mesh on every frame.
+    """
+
+    meshes = om.MSelectionList()
+    for mesh in cmds.ls(type="mesh", noIntermediate=True, long=True):
+        meshes.add(mesh)
+    dagPaths = [meshes.getDagPath(i) for i in range(meshes.length())]
+
+    origFrame = cmds.currentTime(query=True)
+    start, end = frameRange
+    hashes: dict[int, str] = {}
+    try:
+        for frame in range(start, end + 1):
+            cmds.currentTime(frame, update=True)
+            hash = hashlib.sha1(salt.encode())
+            for attribute in _CAMERA_ATTRIBUTES:
+                value = cmds.getAttr(f"{camera}.{attribute}")
+                hash.update(f"{value}".encode())
+            for dagPath in dagPaths:
+                if not dagPath.isVisible():
+                    continue
+                points = om.MFnMesh(dagPath).getPoints(om.MSpace.kWorld)
+                hash.update(dagPath.fullPathName().encode())
+                hash.update(
+                    array.array("d", itertools.chain(*points)).tobytes()
+                )
+            hashes[frame] = hash.hexdigest()
+    finally:
+        cmds.currentTime(origFrame, update=True)
+    return hashes
+
+
+def _findChangedFrames(
+    camera: mobj.DAGNode,
+    exportDir: Path,
+    name: str,
+    masks: dict[str, mobj.DAGNode | Sequence[mobj.DAGNode]],
+    colors: Sequence[Sequence[float]],
+) -> tuple[dict[int, str], list[mframes.FrameRange]]:
+    """Hash the frames to export, and find those whose images are out of date"""
+
+    frameRange = mframes.toWholeFrames(*mapp.getPlaybackRange())
+    salt = json.dumps(
+        [
+            masks,
+            colors,
+            cmds.getAttr("defaultResolution.width"),
+            cmds.getAttr("defaultResolution.height"),
+        ]
+    )
+    with mtiming.span("hash frames", frames=frameRange[1] - frameRange[0] + 1):
+        hashes = _hashFrames(camera, frameRange=frameRange, salt=salt)
+    changed = fseq.findChangedFrameRanges(exportDir, name=name, hashes=hashes)
+    print(
+        f"{sum(e - s + 1 for s, e in changed)} of {len(hashes)} frames changed"
+    )
+    return hashes, changed
+
+
+@mapp.SuspendedRedraw()
+def _exportSequence(
+    name: str,
+    masks: dict[str, mobj.DAGNode | Sequence[mobj.DAGNode]],
+    colors: Sequence[Sequence[float]] = MASK_CHANNELS,
+) -> None:
+    """Playblast masks as a PNG sequence, which keeps them lossless
+
+    Only the frames whose camera or geometry changed since the last export
+    are playblasted again.
+    """
+
+    camera = _findCamera()
+
+    exportDir = fpath.findSharedDrive() / name
+    exportDir.mkdir(exist_ok=True)
+
+    ui = mui.ProgressWindow("progressWindow", WINDOW_TITLE)
+    ui.build().initialize(f"Exporting {name} to:\n{exportDir}").update()
+    ui.show()
+
+    hashes, changed = _findChangedFrames(camera, exportDir, name, masks, colors)
+    if not changed:
+        ui.update().close()
+        return
+    frameCount = sum(end - start + 1 for start, end in changed)
+
+    resolutionWidth = cmds.getAttr("defaultResolution.width")
+    resolutionHeight = cmds.getAttr("defaultResolution.height")
+    framesDone = 0
+
+    def onFrame(done: int, total: int) -> None:
+        ui.reportFrames(framesDone + done, frameCount)
+
+    with _MaskLayer(masks, colors), rec.renderSettings.Playblast() as viewport:
+        cmds.lookThru(viewport, camera)
+        for start, end in changed:
+            with mapp.FrameProgress(onFrame, frameRange=(start, end)):
+                cmds.playblast(
+                    clearCache=True,
+                    compression="png",
+                    endTime=end,
+                    filename=(exportDir / name).as_posix(),
+                    forceOverwrite=True,
+                    format="image",
+                    framePadding=4,
+                    percent=100,
+                    quality=100,
+                    sequenceTime=False,
+                    showOrnaments=False,
+                    startTime=start,
+                    viewer=False,
+                    widthHeight=(resolutionWidth, resolutionHeight),
+                )
+            fseq.recordFrameHashes(
+                exportDir,
+                name=name,
+                hashes={f: hashes[f] for f in range(start, end + 1)},
+            )
+            framesDone += end - start + 1
+    ui.update().close()
+
+
+def _constructRenderArgs(
+    scene: Path,
+    camera: mobj.DAGNode,
+    exportDir: Path,
+    name: str,
+    frameRange: mframes.FrameRange,
+) -> tuple[str, ...]:
+    """Construct the args for rendering a scene's mask layer with Maya
+    Hardware 2.0, which needs no viewport"""
+
+    start, end = frameRange
+    return (
+        os.path.join(os.environ["MAYA_LOCATION"], "bin", "Render"),
+        "-r",
+        "hw2",
+        "-rl",
+        f"rs_{MASKS_LAYER}",  # Render setup's legacy layer
+        "-cam",
+        camera,
+        "-rd",
+        exportDir.as_posix(),
+        "-im",
+        name,
+        "-of",
+        "png",
+        "-fnc",
+        "3",  # name.#.ext
+        "-pad",
+        "4",
+        "-s",
+        f"{start}",
+        "-e",
+        f"{end}",
+        "-x",
+        f"{cmds.getAttr('defaultResolution.width')}",
+        "-y",
+        f"{cmds.getAttr('defaultResolution.height')}",
+        scene.as_posix(),
+    )
+
+
+def renderAlpha(
+    shot: fname.ShotId,
+    geometry: mobj.DAGNode | Sequence[mobj.DAGNode],
+    label: str,
+) -> Path:
+    """Render a mask as a PNG sequence, without an open viewport
+
+    Playblasts need one, so this works in mayapy. A snapshot of the scene,
+    with the mask's render setup layer, is rendered by a separate Render
+    process, but only the frames that changed since the last render. Returns
+    the sequence's folder.
+    """
+
+    camera = _findCamera()
+
+    name = f"{shot.name}_{label}_alpha".upper()
+    exportDir = fpath.findSharedDrive() / name
+    exportDir.mkdir(exist_ok=True)
+
+    rec.renderSettings.setGlobals()
+    cmds.setAttr(
+        "defaultRenderGlobals.currentRenderer", "mayaHardware2", type="string"
+    )
+    # Number the images by frame, like playblasts, to match their hashes
+    cmds.setAttr("defaultRenderGlobals.modifyExtension", False)
+
+    masks = {label: geometry}
+    hashes, changed = _findChangedFrames(
+        camera, exportDir, name, masks=masks, colors=ALPHA_COLORS
+    )
+    if not changed:
+        return exportDir
+
+    print("", f"Rendering {name} to:", exportDir, "", sep="\n")
+    with tempfile.TemporaryDirectory(prefix=f"{fname.SHOW}_mask_") as tempDir:
+        with _MaskLayer(masks, colors=ALPHA_COLORS):
+            scene = mapp.saveSnapshot(Path(tempDir))
+        for start, end in changed:
+            args = _constructRenderArgs(
+                scene, camera, exportDir, name=name, frameRange=(start, end)
+            )
+            subprocess.run(args, check=True)
+            fseq.recordFrameHashes(
+                exportDir,
+                name=name,
+                hashes={f: hashes[f] for f in range(start, end + 1)},
+            )
+    return exportDir
+
+
+def findMechanic() -> mobj.DAGNode | None:
+    geometry = mobj.MECHANIC_MODEL_GEO_GRP
+    return geometry if mobj.nodeExists(geometry, "transform") else None
+
+
+def findRobot() -> mobj.DAGNode | None:
+    for geometry in cmds.ls(mobj.ROBOT_MODEL_GEO_GRP, transforms=True):
+        if "robot" in geometry:
+            return geometry
+    return None
 
 
 @mapp.logScriptEditorOutput
 def exportMechanic() -> None:
     shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
 
-    geometry = mobj.MECHANIC_MODEL_GEO_GRP
-    if not mobj.nodeExists(geometry, "transform"):
+    geometry = findMechanic()
+    if geometry is None:
         raise Exception("Mechanic not in scene")
 
     _main(shot=shot, geometry=geometry, label="MC")
@@ -195,15 +569,65 @@ def exportMechanic() -> None:
 def exportRobot() -> None:
     shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
 
-    for geometry in cmds.ls(mobj.ROBOT_MODEL_GEO_GRP, transforms=True):
-        if "robot" in geometry:
-            break
-    else:
+    geometry = findRobot()
+    if geometry is None:
         raise Exception("Robot not in scene")
 
     _main(shot=shot, geometry=geometry, label="RB")
 
 
+@mapp.logScriptEditorOutput
+def exportMechanicSequence() -> None:
+    """Export the Mechanic's mask as a PNG sequence instead of a movie"""
+
+    shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
+
+    geometry = findMechanic()
+    if geometry is None:
+        raise Exception("Mechanic not in scene")
+
+    name = f"{shot.name}_MC_alpha".upper()
+    _exportSequence(name, masks={"MC": geometry}, colors=ALPHA_COLORS)
+
+
+@mapp.logScriptEditorOutput
+def exportRobotSequence() -> None:
+    """Export the Robot's mask as a PNG sequence instead of a movie"""
+
+    shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
+
+    geometry = findRobot()
+    if geometry is None:
+        raise Exception("Robot not in scene")
+
+    name = f"{shot.name}_RB_alpha".upper()
+    _exportSequence(name, masks={"RB": geometry}, colors=ALPHA_COLORS)
+
+
+@mapp.logScriptEditorOutput
+def exportInOnePass() -> None:
+    """Export the Mechanic, Robot, and selected geometry's masks at once
+
+    They are in the red, green, and blue channels of one image sequence, in
+    that order, and named after their labels, e.g. 'SEQ010_MC_RB_SEL_RGB'.
+    """
+
+    shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
+
+    masks: dict[str, mobj.DAGNode | Sequence[mobj.DAGNode]] = {}
+    if (mechanic := findMechanic()) is not None:
+        masks["MC"] = mechanic
+    if (robot := findRobot()) is not None:
+        masks["RB"] = robot
+    if (selected := mobj.lsSelectedGeometry()) is not None:
+        masks["SEL"] = selected
+    if not masks:
+        raise Exception("No characters in scene, or geometry selected")
+
+    name = f"{shot.name}_{'_'.join(masks)}_rgb".upper()
+    _exportSequence(name, masks=masks)
+
+
 def exportSelected() -> None:
     shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
 
@@ -0,0 +1,126 @@
+#!/Applications/Autodesk/maya2023/Maya.app/Contents/bin/mayapy
+"""Export the Mechanic and Robot compositing masks of queued shots"""
+
+__author__ = "Charles Mesa Cayobit"
+
+import sys
+import traceback
+from argparse import SUPPRESS, ArgumentParser
+from pathlib import Path
+
+import maya.cmds as cmds
+
+import rec.export_compositingMask
+import rec.modules.files.names as fname
+import rec.modules.maya as mapp
+import rec.modules.queue as mqueue
+import rec.modules.workers as mworkers
+
+_SCRIPTS_DIR = Path(__file__).parents[1]
+_EXPORT_QUEUE = _SCRIPTS_DIR / "__mask_queue.jsonl"
+_LOGS_DIR = _SCRIPTS_DIR / "logs"
+
+
+def exportShot(scene: Path) -> None:
+    """Render the masks of every character in a shot's scene"""
+
+    shot = fname.ShotId.fromFilename(scene.stem)
+    cmds.file(scene, open=True, force=True)
+
+    masks = {
+        "MC": rec.export_compositingMask.findMechanic(),
+        "RB": rec.export_compositingMask.findRobot(),
+    }
+    if all(geometry is None for geometry in masks.values()):
+        raise Exception(f"No characters in {scene.name}")
+
+    for label, geometry in masks.items():
+        if geometry is not None:
+            rec.export_compositingMask.renderAlpha(shot, geometry, label)
+
+
+def _openQueue() -> mqueue.JobQueue:
+    queue = mqueue.JobQueue(_EXPORT_QUEUE)
+    queue.requeueExpired()  # Of earlier runs that were killed
+    return queue
+
+
+def main() -> bool:
+    """Export the queued shots one at a time, carrying on past failures"""
+
+    queue = _openQueue()
+    owner = mqueue.getOwner()
+    failed = []
+    with queue.lease(owner):
+        while (job := queue.claim(owner=owner)) is not None:
+            try:
+                exportShot(Path(job.item))
+            except Exception as e:
+                traceback.print_exc()
+                queue.fail(job.id, reason=f"{e}", owner=owner)
+                failed.append(Path(job.item))
+            else:
+                queue.ack(job.id, owner=owner)
+
+    if failed:
+        print(
+            "",
+            f"Failed to export the masks of {len(failed)} shots:",
+            *(f"  {s.name}" for s in failed),
+            sep="\n",
+        )
+    return not failed
+
+
+def mainInParallel(workers: int, retries: int) -> bool:
+    """Export the queued shots in parallel mayapy processes, one shot each"""
+    return mworkers.runSceneQueue(
+        _openQueue(),
+        script=__file__,
+        logsDir=_LOGS_DIR,
+        logSuffix="maskQueue",
+        label="masks",
+        maxWorkers=workers,
+        retries=retries,
+    )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "scenes",
+        nargs="*",
+        type=Path,
+        help="Shot scenes to add to the queue before exporting",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of shots to export at once in separate mayapy processes",
+    )
+    parser.add_argument(
+        "-r",
+        "--retries",
+        type=int,
+        default=1,
+        help="Times to retry a shot whose worker failed or crashed",
+    )
+    parser.add_argument("--scene", type=Path, help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenes:
+        mqueue.JobQueue(_EXPORT_QUEUE).enqueue(
+            *(s.resolve().as_posix() for s in args.scenes)
+        )
+
+    if args.scene is not None:
+        with mapp.Standalone():
+            exportShot(args.scene)
+    elif args.workers > 1:
+        sys.exit(0 if mainInParallel(args.workers, args.retries) else 1)
+    else:
+        with mapp.Standalone():
+            succeeded = main()
+        sys.exit(0 if succeeded else 1)
@@ -0,0 +1,49 @@
+"""Export part of the timeline's geometry cache, as a worker of a chunked
+export"""
+
+__author__ = "Charles Mesa Cayobit"
+
+from argparse import ArgumentParser
+from pathlib import Path
+
+import maya.cmds as cmds
+
+import rec.geometryCache
+import rec.modules.maya as mapp
+import rec.modules.progress as mprogress
+
+
+def main(
+    scene: Path,
+    dir: Path,
+    filename: str,
+    start: int,
+    end: int,
+    nodes: list[str],
+) -> None:
+    cmds.file(scene.as_posix(), open=True, force=True)
+    with mapp.FrameProgress(mprogress.emit, frameRange=(start, end)):
+        rec.geometryCache.exportChunk(
+            nodes, dir=dir, filename=filename, frameRange=(start, end)
+        )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("scene", type=Path)
+    parser.add_argument("dir", type=Path)
+    parser.add_argument("filename")
+    parser.add_argument("start", type=int)
+    parser.add_argument("end", type=int)
+    parser.add_argument("nodes", nargs="+")
+    args = parser.parse_args()
+
+    with mapp.Standalone():
+        main(
+            args.scene,
+            args.dir,
+            args.filename,
+            args.start,
+            args.end,
+            args.nodes,
+        )
@@ -3,9 +3,11 @@ __author__ = "Charles Mesa Cayobit"
 from argparse import ArgumentParser
 from collections.abc import Sequence
 from pathlib import Path
+from typing import Any
 
 import maya.cmds as cmds
 
+import rec.modules.helpers as mhelpers
 import rec.modules.maya as mapp
 import rec.modules.maya.objects as mobj
 
@@ -15,12 +17,37 @@ def main(maPath: Path, mbPath: Path, nodes: Sequence[mobj.DGNode]) -> None:
     mobj.export(nodes, filePath=mbPath, fileType=mapp.FileType.BINARY)
 
 
+def handle(request: dict[str, Any]) -> None:
+    """Export the nodes requested by a Maya session, then reset the scene"""
+
+    try:
+        main(Path(request["maPath"]), Path(request["mbPath"]), request["nodes"])
+    finally:
+        cmds.file(new=True, force=True)
+
+
 if __name__ == "__main__":
     parser = ArgumentParser()
-    parser.add_argument("maPath", type=Path)
-    parser.add_argument("mbPath", type=Path)
-    parser.add_argument("nodes", nargs="+")
+    parser.add_argument("maPath", type=Path, nargs="?")
+    parser.add_argument("mbPath", type=Path, nargs="?")
+    parser.add_argument("nodes", nargs="*")
+    parser.add_argument(
+        "--serve",
+        type=Path,
+        metavar="REGISTRY_DIR",
+        help="Stay open, exporting files requested through a local socket",
+    )
+    parser.add_argument(
+        "--idle-timeout", type=float, default=mhelpers.DEFAULT_IDLE_TIMEOUT
+    )
     args = parser.parse_args()
+    if args.serve is None and not args.nodes:
+        parser.error("maPath, mbPath and nodes are required")
 
     with mapp.Standalone():
-        main(args.maPath, args.mbPath, args.nodes)
+        if args.serve is None:
+            main(args.maPath, args.mbPath, args.nodes)
+        else:
+            mhelpers.serve(
+                args.serve, handle=handle, idleTimeout=args.idle_timeout
+            )
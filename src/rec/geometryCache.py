@@ -7,16 +7,25 @@ __author__ = "Charles Mesa Cayobit"
 from collections.abc import Sequence
 from functools import partial
 from pathlib import Path
-from typing import NoReturn
+from tempfile import TemporaryDirectory
+from typing import Any, NoReturn
 
 import maya.cmds as cmds
 import maya.mel as mel
 
+import rec.modules.files.cacheFiles as fcacheFiles
+import rec.modules.files.catalog as fcatalog
+import rec.modules.files.manifest as fmanifest
 import rec.modules.files.names as fname
 import rec.modules.files.paths as fpath
+import rec.modules.frames as mframes
 import rec.modules.maya as mapp
+import rec.modules.maya.background as mbackground
 import rec.modules.maya.objects as mobj
 import rec.modules.maya.ui as mui
+import rec.modules.progress as mprogress
+import rec.modules.timing as mtiming
+import rec.modules.workers as mworkers
 
 ################################################################################
 # Export
@@ -33,21 +42,19 @@ def constructFilename(
     filenameBase = fname.constructFilenameBase(
         shot, assetName=assetName, assetType=assetType
     )
-    validator = fname.constructValidator(
-        filenameBase, assetName=assetName, assetType=assetType
+    version = fcatalog.VersionCatalog(dir).nextVersion(
+        shot, assetType=assetType, assetName=assetName
     )
-    versionSuffix = fname.constructVersionSuffix(
-        validator,
-        files=fpath.findShotFiles(shot, directory=dir),
-    )
-    return f"{filenameBase}_{versionSuffix}"
+    return f"{filenameBase}_{fname.formatVersionSuffix(version)}"
 
 
-def export(
-    geometry: mobj.DAGNode | Sequence[mobj.DAGNode], dir: Path, filename: str
-) -> None:
-    """Call the MEL procedure for exporting a geometry cache"""
-    cmds.workspace(fileRule=("fileCache", dir.as_posix()))
+def _constructDoCreateGeometryCacheCmd(
+    dir: Path, filename: str, frameRange: mframes.FrameRange | None = None
+) -> str:
+    """Construct the MEL command for exporting a geometry cache
+
+    Without a frame range, the whole timeline is exported.
+    """
 
     # global proc stirng[] doCreateGeometryCache( int $version, string $args[] )
     #     $version == 1:
@@ -90,15 +97,141 @@ def export(
 
     #     $version == 6:
     #         $args[16] = 0/1, whether to export in local or world space
-    doCreateGeometryCacheCmd = (
-        f'doCreateGeometryCache 6 {{"2", "1", "10", "OneFile", "0", '
+    if frameRange is None:
+        timeRange = '"2", "1", "10"'
+    else:
+        timeRange = f'"0", "{frameRange[0]}", "{frameRange[1]}"'
+    return (
+        f'doCreateGeometryCache 6 {{{timeRange}, "OneFile", "0", '
         f'"{dir.as_posix()}", "0", "{filename}", "0", "export", '
         '"1", "1", "1", "0", "0", "mcx", "1"}'
     )
-    with mobj.TemporarySelection(geometry):
+
+
+def exportChunk(
+    geometry: mobj.DAGNode | Sequence[mobj.DAGNode],
+    dir: Path,
+    filename: str,
+    frameRange: mframes.FrameRange,
+) -> None:
+    """Export a geometry cache for part of the timeline
+
+    The chunk isn't recorded in the manifest, since it isn't published.
+    """
+
+    cmds.workspace(fileRule=("fileCache", dir.as_posix()))
+    doCreateGeometryCacheCmd = _constructDoCreateGeometryCacheCmd(
+        dir, filename=filename, frameRange=frameRange
+    )
+    with mobj.TemporarySelection(geometry), mtiming.span(
+        "doCreateGeometryCache", frameRange=frameRange
+    ):
         mel.eval(doCreateGeometryCacheCmd)
 
 
+_CHUNK_SCRIPT_PATH = Path(__file__).with_name("export_geometryCacheChunk.py")
+
+# Evaluated from the previous frame, so a chunk can't start cold on its own
+_SIMULATION_NODE_TYPES = ("nucleus", "hairSystem", "particle", "jiggle")
+
+
+def _lsSimulations(geometry: Sequence[mobj.DAGNode]) -> list[mobj.DGNode]:
+    """List the simulation nodes, e.g. nCloth's, in the geometry's history"""
+    history = cmds.listHistory(geometry) or []
+    return cmds.ls(history, type=_SIMULATION_NODE_TYPES) or []
+
+
+def _exportInChunks(
+    geometry: Sequence[mobj.DAGNode], dir: Path, filename: str, chunks: int
+) -> None:
+    """Export chunks of the timeline in parallel mayapy processes, then merge
+
+    The scene, including unsaved changes, is saved to a temporary snapshot,
+    which each worker process opens to export its chunk.
+    """
+
+    ranges = mframes.split(*mapp.getPlaybackRange(), count=chunks)
+    chunkFilenames = [f"{filename}_chunk{i:03}" for i in range(len(ranges))]
+
+    with TemporaryDirectory(prefix=f"{fname.SHOW}_") as tempDir:
+        chunksDir = Path(tempDir)
+        with mtiming.span("save snapshot"):
+            scene = mapp.saveSnapshot(chunksDir)
+        commands = [
+            (
+                mworkers.getMayapyPath(),
+                _CHUNK_SCRIPT_PATH,
+                scene,
+                chunksDir,
+                chunkFilename,
+                start,
+                end,
+                *geometry,
+            )
+            for chunkFilename, (start, end) in zip(chunkFilenames, ranges)
+        ]
+        # Pass the chunks' progress on, e.g. to the export's progress window
+        done = [0] * len(commands)
+        total = sum(end - start + 1 for start, end in ranges)
+
+        def reportFrames(i: int, event: mprogress.Event) -> None:
+            done[i] = event.done
+            mapp.reportFrames(sum(done), total)
+
+        with mtiming.span("export chunks", chunks=len(commands)):
+            results = mworkers.run(
+                commands, maxWorkers=chunks, onProgress=reportFrames
+            )
+        for r in results:
+            r.print()
+        if not all(r.succeeded for r in results):
+            raise RuntimeError(f"Failed to export geometry cache: {filename}")
+
+        fcacheFiles.merge(
+            [chunksDir / f"{c}{fname.FileExt.XML}" for c in chunkFilenames],
+            xmlFile=dir / f"{filename}{fname.FileExt.XML}",
+        )
+
+
+def export(
+    geometry: mobj.DAGNode | Sequence[mobj.DAGNode],
+    dir: Path,
+    filename: str,
+    chunks: int = 1,
+) -> None:
+    """Call the MEL procedure for exporting a geometry cache
+
+    With more than one chunk, the timeline is split into chunks that are
+    exported in parallel, then merged into one cache. Simulated geometry is
+    exported in one pass instead, since a chunk would start its simulation
+    at its own first frame.
+
+    The exported description and cache files are recorded in the manifest.
+    """
+
+    nodes = [geometry] if isinstance(geometry, str) else geometry
+    if chunks > 1 and (simulations := _lsSimulations(nodes)):
+        print(f"Exporting in one pass, since it's simulated by: {simulations}")
+        chunks = 1
+    if chunks > 1:
+        _exportInChunks(nodes, dir=dir, filename=filename, chunks=chunks)
+    else:
+        cmds.workspace(fileRule=("fileCache", dir.as_posix()))
+        doCreateGeometryCacheCmd = _constructDoCreateGeometryCacheCmd(
+            dir, filename=filename
+        )
+        with mobj.TemporarySelection(geometry), mtiming.span(
+            "doCreateGeometryCache"
+        ):
+            mel.eval(doCreateGeometryCacheCmd)
+
+    frameRange = mapp.getPlaybackRange()
+    for fileExt in fname.FileExt.XML, fname.FileExt.MAYA_CACHE:
+        fmanifest.record(
+            dir / f"{filename}{fileExt}", frameRange=frameRange, nodes=nodes
+        )
+
+
 def _getNodeNameBase(node: mobj.DAGNode) -> str:
     """From a node name 'namespace:node_name_type', get 'node_name'"""
     return node.rsplit(":", 1)[-1].rsplit("_", 1)[0]
@@ -116,18 +249,20 @@ def _buildWindow(*objects: str, outputPath: Path) -> mui.ProgressWindow:
     return ui
 
 
-# FIXME: make exporting to test folder separate from main
-@mapp.SuspendedRedraw()
-@mapp.logScriptEditorOutput
-def exportSelected() -> None:
-    geometry = mobj.lsSelectedGeometry()
-    if geometry is None:
-        raise mobj.NoGeometrySelectedError
-
+def _findCachesDir() -> tuple[fname.ShotId, Path]:
     shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
     shotDir = fpath.findShotPath(shot, parentDir=fpath.findSharedDrive())
     cachesDir = shotDir / fpath.CACHES_DIR
     # cachesDir = fpath.getScenePath().parents[1] / "cache"
+    return shot, cachesDir
+
+
+def _exportSelected(chunks: int = 1) -> None:
+    geometry = mobj.lsSelectedGeometry()
+    if geometry is None:
+        raise mobj.NoGeometrySelectedError
+
+    shot, cachesDir = _findCachesDir()
 
     ui = _buildWindow(*geometry, outputPath=cachesDir).show()
 
@@ -138,10 +273,71 @@ def exportSelected() -> None:
         assetName=assetName,
         assetType=fname.AssetType.CACHE,
     )
-    export(geometry, dir=cachesDir, filename=filename)
+    with mapp.FrameProgress(ui.reportFrames):
+        export(geometry, dir=cachesDir, filename=filename, chunks=chunks)
     ui.update().close()
 
 
+# FIXME: make exporting to test folder separate from main
+@mapp.SuspendedRedraw()
+@mapp.logScriptEditorOutput
+def exportSelected() -> None:
+    _exportSelected()
+
+
+@mapp.SuspendedRedraw()
+@mapp.logScriptEditorOutput
+def exportSelectedInChunks() -> None:
+    """Export the selected geometry's cache in parallel mayapy processes,
+    one per chunk of the timeline, for long shots"""
+    _exportSelected(chunks=mworkers.getDefaultWorkerCount())
+
+
+def exportFromBackground(geometry: list[str], dir: str, filename: str) -> None:
+    """Export a geometry cache in a background job, from its JSON arguments"""
+    export(geometry, dir=Path(dir), filename=filename)
+
+
+@mapp.logScriptEditorOutput
+def exportSelectedInBackground() -> mbackground.Job:
+    """Export the selected geometry's cache without blocking the Maya session
+
+    The cache's version is reserved in this session, so exporting again before
+    the job finishes doesn't reuse it. It's released once the job finishes,
+    whether or not it succeeded.
+    """
+
+    geometry = mobj.lsSelectedGeometry()
+    if geometry is None:
+        raise mobj.NoGeometrySelectedError
+
+    shot, cachesDir = _findCachesDir()
+    filename = constructFilename(
+        cachesDir,
+        shot=shot,
+        assetName=_getNodeNameBase(geometry[0]),
+        assetType=fname.AssetType.CACHE,
+    )
+    catalog = fcatalog.VersionCatalog(cachesDir)
+    reserved = cachesDir / f"{filename}{fname.FileExt.XML}"
+    catalog.reserve(reserved)
+
+    ui = mui.ProgressWindow("progressWindow", "Geometry Cache Exporter")
+    ui.build().initialize(
+        f"Exporting {filename} in the background to:\n{cachesDir}"
+    ).update().show()
+
+    job = mbackground.submit(
+        exportFromBackground,
+        onStatus=mbackground.reportTo(ui),
+        geometry=list(geometry),
+        dir=cachesDir.as_posix(),
+        filename=filename,
+    )
+    job.whenFinished(lambda *_: catalog.release(reserved))
+    return job
+
+
 ################################################################################
 # Import
 ################################################################################
@@ -150,30 +346,44 @@ def exportSelected() -> None:
 class _GeometryCacheComponents:
     """Group of nodes that comprise a geometry cache"""
 
-    __slots__ = "_origCacheFile", "cacheFile"
+    __slots__ = "_origCacheFile", "cacheFile", "historySwitch", "mesh"
 
     def __new__(
-        cls, cacheFile: mobj.DGNode
+        cls, cacheFile: mobj.DGNode, *args: Any, **kwargs: Any
     ) -> _GeometryCacheComponents | NoReturn:
         """Don't create an instance if not provided a cacheFile node"""
         if cmds.objectType(cacheFile, isType="cacheFile"):
             return super().__new__(cls)
         raise TypeError(f"{cacheFile} must be a cacheFile node")
 
-    def __init__(self, cacheFile: mobj.DGNode) -> None:
+    def __init__(
+        self,
+        cacheFile: mobj.DGNode,
+        historySwitch: mobj.DGNode,
+        mesh: mobj.ShapeNode,
+    ) -> None:
         self._origCacheFile = cacheFile
         self.cacheFile = cacheFile
+        self.historySwitch = historySwitch
+        self.mesh = mesh
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self._origCacheFile!r})"
 
-    @property
-    def historySwitch(self) -> mobj.DGNode:
-        return cmds.listConnections(self.cacheFile, type="historySwitch")[0]
-
-    @property
-    def mesh(self) -> mobj.ShapeNode:
-        return cmds.listConnections(self.historySwitch, type="mesh")[0]
+    @classmethod
+    def fromCacheFiles(
+        cls, cacheFiles: Sequence[mobj.DGNode]
+    ) -> list[_GeometryCacheComponents]:
+        """Find the components of every cacheFile node in one pass"""
+
+        historySwitches = [
+            s[0] for s in mobj.getConnectedNodes(cacheFiles, "historySwitch")
+        ]
+        meshes = [m[0] for m in mobj.getConnectedNodes(historySwitches, "mesh")]
+        return [
+            cls(c, historySwitch=h, mesh=m)
+            for c, h, m in zip(cacheFiles, historySwitches, meshes)
+        ]
 
     @property
     def meshPart(self) -> str:
@@ -182,7 +392,9 @@ class _GeometryCacheComponents:
     def rename(self, identifier: fname.Identifier) -> None:
         nameBase = f"{identifier}_{self.meshPart}"
         self.cacheFile = cmds.rename(self.cacheFile, f"{nameBase}_cache")
-        cmds.rename(self.historySwitch, f"{nameBase}_historySwitch")
+        self.historySwitch = cmds.rename(
+            self.historySwitch, f"{nameBase}_historySwitch"
+        )
 
 
 def assetize(assetName: fname.NameIdentifier, namespace: str) -> None:
@@ -192,8 +404,8 @@ def assetize(assetName: fname.NameIdentifier, namespace: str) -> None:
     """
     cacheFileNodes = mobj.lsWithWildcard(assetName, type="cacheFile")
     componentNodes: list[mobj.DGNode] = []
-    for i, c in enumerate(cacheFileNodes):
-        components = _GeometryCacheComponents(c)
+    allComponents = _GeometryCacheComponents.fromCacheFiles(cacheFileNodes)
+    for i, components in enumerate(allComponents):
         components.rename(assetName)
 
         cacheFileNodes[i] = components.cacheFile
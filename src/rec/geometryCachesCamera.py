@@ -5,8 +5,10 @@ from __future__ import annotations
 
 __author__ = "Charles Mesa Cayobit"
 
+from collections.abc import Sequence
 from functools import partial
 from pathlib import Path
+from tempfile import TemporaryDirectory
 
 import maya.api.OpenMaya as om
 import maya.cmds as cmds
@@ -14,11 +16,18 @@ import maya.mel as mel
 
 import rec.camera
 import rec.geometryCache
+import rec.modules.files.catalog as fcatalog
+import rec.modules.files.manifest as fmanifest
 import rec.modules.files.names as fname
 import rec.modules.files.paths as fpath
+import rec.modules.frames as mframes
 import rec.modules.maya as mapp
+import rec.modules.maya.background as mbackground
 import rec.modules.maya.objects as mobj
 import rec.modules.maya.ui as mui
+import rec.modules.stringEnum as strEnum
+import rec.modules.timing as mtiming
+import rec.modules.workers as mworkers
 import rec.reference
 
 ################################################################################
@@ -27,27 +36,115 @@ import rec.reference
 
 
 def exportGeometryCache(
-    geometryGrp: mobj.DAGNode, dir: Path, filename: str
+    geometryGrp: mobj.DAGNode, dir: Path, filename: str, chunks: int = 1
 ) -> None:
     """Export a geometry cache for all geometry under a group"""
 
     geometry = mobj.lsChildren(geometryGrp)
-    rec.geometryCache.export(geometry, dir=dir, filename=filename)
+    rec.geometryCache.export(
+        geometry, dir=dir, filename=filename, chunks=chunks
+    )
 
 
-def _exportAlembicCache(geometry: mobj.DAGNode, filePath: Path) -> None:
-    """Export an Alembic cache"""
+_ALEMBIC_FRAME_CALLBACK = (
+    '"import rec.modules.maya as mapp; mapp.tickFrame(#FRAME#)"'
+)
+
+
+def _exportAlembicCaches(
+    jobs: Sequence[tuple[mobj.DAGNode, Path]], stripNamespaces: bool = False
+) -> None:
+    """Export Alembic caches, then record them in the manifest
+
+    All caches are exported by a single AbcExport call, so the timeline is
+    evaluated once no matter how many caches there are. Like the geometry
+    caches, they cover the playback range.
+    """
 
     mapp.loadPlugin("AbcExport")
-    cmds.workspace(fileRule=("alembicCache", filePath.parent.as_posix()))
+    cmds.workspace(fileRule=("alembicCache", jobs[0][1].parent.as_posix()))
 
-    startTime = cmds.playbackOptions(query=True, animationStartTime=True)
-    endTime = cmds.playbackOptions(query=True, animationEndTime=True)
-    args = (
+    startTime, endTime = mapp.getPlaybackRange()
+    flags = "-stripNamespaces -worldSpace" if stripNamespaces else "-worldSpace"
+    jobArgs = [
         f'-file "{filePath.as_posix()}" -root {geometry} '
-        f"-frameRange {startTime} {endTime} -worldSpace"
+        f"-frameRange {startTime} {endTime} {flags}"
+        for geometry, filePath in jobs
+    ]
+    if mapp.FrameProgress.active is not None:
+        # The jobs are evaluated together, so one reports the frames for all
+        jobArgs[0] += f" -pythonPerFrameCallback {_ALEMBIC_FRAME_CALLBACK}"
+    with mtiming.span("AbcExport", caches=len(jobs)):
+        cmds.AbcExport(jobArg=jobArgs)
+
+    for geometry, filePath in jobs:
+        fmanifest.record(
+            filePath, frameRange=(startTime, endTime), nodes=(geometry,)
+        )
+
+
+def _exportAlembicCache(geometry: mobj.DAGNode, filePath: Path) -> None:
+    """Export an Alembic cache, then record it in the manifest"""
+    _exportAlembicCaches(((geometry, filePath),))
+
+
+class Asset(strEnum.StringEnum):
+    """Assets exported from a shot, in the order they are exported"""
+
+    MECHANIC = fname.AssetName.MECHANIC.value
+    ROBOT = fname.AssetName.ROBOT.value
+    ROBOT_FACE = fname.AssetName.ROBOT_FACE.value
+    CAMERA = "camera"
+
+
+_RIG_GEOMETRY = {
+    Asset.MECHANIC: mobj.MECHANIC_RIG_GEO_GRP,
+    Asset.ROBOT: mobj.ROBOT_RIG_GEO_GRP,
+    Asset.ROBOT_FACE: mobj.ROBOT_FACE_RIG_GEO,
+}
+
+
+_FILE_EXTS = {
+    Asset.ROBOT_FACE: fname.FileExt.ALEMBIC,
+    Asset.CAMERA: fname.FileExt.MAYA_BINARY,
+}
+
+
+def _isInScene(asset: Asset) -> bool:
+    if asset is Asset.CAMERA:
+        return bool(rec.camera.getComponents(mobj.TopLevelGroup.CAMERA))
+    return cmds.objExists(_RIG_GEOMETRY[asset])
+
+
+def constructAssetFilename(asset: Asset, dir: Path, shot: fname.ShotId) -> str:
+    """Construct the filename of the asset's next version"""
+
+    if asset is Asset.CAMERA:
+        return rec.geometryCache.constructFilename(
+            dir, shot=shot, assetType=fname.AssetType.CAMERA
+        )
+    return rec.geometryCache.constructFilename(
+        dir, shot=shot, assetName=asset, assetType=fname.AssetType.CACHE
     )
-    cmds.AbcExport(jobArg=args)
+
+
+def exportAsset(asset: Asset, dir: Path, filename: str) -> None:
+    """Export a character geometry cache, Robot face cache, or camera"""
+
+    if asset is Asset.CAMERA:
+        cameraNodes = rec.camera.getComponents(mobj.TopLevelGroup.CAMERA)
+        with mtiming.span("export camera"):
+            rec.camera.export(
+                cameraNodes,  # type: ignore
+                filePath=dir / f"{filename}{fname.FileExt.MAYA_BINARY}",
+            )
+    elif asset is Asset.ROBOT_FACE:
+        _exportAlembicCache(
+            _RIG_GEOMETRY[asset],
+            filePath=dir / f"{filename}{fname.FileExt.ALEMBIC}",
+        )
+    else:
+        exportGeometryCache(_RIG_GEOMETRY[asset], dir=dir, filename=filename)
 
 
 def _buildWindow_e(outputPath: Path) -> mui.ProgressWindow:
@@ -66,63 +163,191 @@ def _buildWindow_e(outputPath: Path) -> mui.ProgressWindow:
     return ui
 
 
-# FIXME: make exporting to test folder separate from main
-@mapp.SuspendedRedraw()
-@mapp.logScriptEditorOutput
-def export() -> None:
+def _buildWindow_s(outputPath: Path) -> mui.ProgressWindow:
+    ui = mui.ProgressWindow("progressWindow", "Cache & Camera Exporter")
+
+    def defineTask(product: str) -> str:
+        return f"Exporting {product} to:\n{outputPath}"
+
+    ui.build().initialize(
+        defineTask("Mechanic, Robot, and Robot face alembic caches"),
+        defineTask("camera"),
+    ).update()
+
+    return ui
+
+
+def _findCachesDir() -> tuple[fname.ShotId, Path]:
     shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
     shotDir = fpath.findShotPath(shot, parentDir=fpath.findSharedDrive())
     cachesDir = shotDir / fpath.CACHES_DIR
     # cachesDir = fpath.getScenePath().parents[1] / "cache"
+    return shot, cachesDir
 
-    constructFilenameCmd = partial(
-        rec.geometryCache.constructFilename,
-        dir=cachesDir,
-        shot=shot,
-    )
-    exportGeometryCacheCmd = partial(exportGeometryCache, dir=cachesDir)
+
+# FIXME: make exporting to test folder separate from main
+@mapp.SuspendedRedraw()
+@mapp.logScriptEditorOutput
+def export() -> None:
+    shot, cachesDir = _findCachesDir()
+    if mobj.lsUnknown():  # Warm up while the caches export
+        rec.camera.startHelpers()
 
     ui = _buildWindow_e(cachesDir).show()
 
-    mechanicRigGeoGrp = mobj.MECHANIC_RIG_GEO_GRP
-    if cmds.objExists(mechanicRigGeoGrp):
-        mechanicFilename = constructFilenameCmd(
-            assetName=fname.AssetName.MECHANIC,
-            assetType=fname.AssetType.CACHE,
-        )
-        exportGeometryCacheCmd(mechanicRigGeoGrp, filename=mechanicFilename)
-    ui.update()
+    for asset in Asset:
+        if _isInScene(asset):
+            filename = constructAssetFilename(asset, dir=cachesDir, shot=shot)
+            with mapp.FrameProgress(ui.reportFrames):
+                exportAsset(asset, dir=cachesDir, filename=filename)
+        ui.update()
+    ui.close()
 
-    robotRigGeoGrp = mobj.ROBOT_RIG_GEO_GRP
-    if cmds.objExists(robotRigGeoGrp):
-        robotFilename = constructFilenameCmd(
-            assetName=fname.AssetName.ROBOT,
-            assetType=fname.AssetType.CACHE,
-        )
-        exportGeometryCacheCmd(robotRigGeoGrp, filename=robotFilename)
-    ui.update()
 
-    robotFaceRigGeoGrp = mobj.ROBOT_FACE_RIG_GEO
-    if cmds.objExists(robotFaceRigGeoGrp):
-        robotFaceFilename = constructFilenameCmd(
-            assetName=fname.AssetName.ROBOT_FACE,
-            assetType=fname.AssetType.CACHE,
-        )
-        _exportAlembicCache(
-            robotFaceRigGeoGrp,
-            filePath=cachesDir / f"{robotFaceFilename}{fname.FileExt.ALEMBIC}",
-        )
+@mapp.SuspendedRedraw()
+@mapp.logScriptEditorOutput
+def exportInSinglePass() -> None:
+    """Export every geometry cache from a single evaluation of the timeline
+
+    The character caches are exported as Alembic caches alongside the Robot
+    face cache, using one AbcExport job per cache, instead of evaluating the
+    rigs once per cache.
+    """
+
+    shot, cachesDir = _findCachesDir()
+    if mobj.lsUnknown():  # Warm up while the caches export
+        rec.camera.startHelpers()
+
+    ui = _buildWindow_s(cachesDir).show()
+
+    alembicJobs = []
+    for asset in Asset.MECHANIC, Asset.ROBOT, Asset.ROBOT_FACE:
+        if _isInScene(asset):
+            filename = constructAssetFilename(asset, dir=cachesDir, shot=shot)
+            filePath = cachesDir / f"{filename}{fname.FileExt.ALEMBIC}"
+            alembicJobs.append((_RIG_GEOMETRY[asset], filePath))
+    if alembicJobs:
+        # Names must match the referenced models' when the caches are applied
+        with mapp.FrameProgress(ui.reportFrames):
+            _exportAlembicCaches(alembicJobs, stripNamespaces=True)
     ui.update()
 
-    if cameraNodes := rec.camera.getComponents(mobj.TopLevelGroup.CAMERA):
-        cameraFilename = constructFilenameCmd(assetType=fname.AssetType.CAMERA)
-        rec.camera.export(
-            cameraNodes,
-            filePath=cachesDir / f"{cameraFilename}{fname.FileExt.MAYA_BINARY}",
+    if _isInScene(Asset.CAMERA):
+        filename = constructAssetFilename(
+            Asset.CAMERA, dir=cachesDir, shot=shot
         )
+        with mapp.FrameProgress(ui.reportFrames):
+            exportAsset(Asset.CAMERA, dir=cachesDir, filename=filename)
     ui.update().close()
 
 
+_WORKER_SCRIPT_PATH = Path(__file__).with_name("export_cachesCamera_worker.py")
+
+
+def _buildWindow_p(outputPath: Path, assetCount: int) -> mui.ProgressWindow:
+    ui = mui.ProgressWindow("progressWindow", "Cache & Camera Exporter")
+    ui.build().initialize(
+        f"Exporting {assetCount} caches & camera in parallel to:"
+        f"\n{outputPath}"
+    ).update()
+
+    return ui
+
+
+@mapp.logScriptEditorOutput
+def exportInParallel() -> None:
+    """Export each asset in its own mayapy process
+
+    The scene, including unsaved changes, is saved to a temporary snapshot,
+    then each worker process opens it and exports one asset.
+    """
+
+    shot, cachesDir = _findCachesDir()
+
+    filenames = {
+        a: constructAssetFilename(a, dir=cachesDir, shot=shot)
+        for a in Asset
+        if _isInScene(a)
+    }
+    ui = _buildWindow_p(cachesDir, assetCount=len(filenames)).show()
+    start, end = mframes.toWholeFrames(*mapp.getPlaybackRange())
+    tracker = ui.trackFrames((end - start + 1) * len(filenames))
+
+    with TemporaryDirectory(prefix=f"{fname.SHOW}_") as tempDir:
+        with mtiming.span("save snapshot"):
+            scene = mapp.saveSnapshot(Path(tempDir))
+        commands = [
+            (
+                mworkers.getMayapyPath(),
+                _WORKER_SCRIPT_PATH,
+                scene,
+                cachesDir,
+                asset,
+                filename,
+            )
+            for asset, filename in filenames.items()
+        ]
+        with mtiming.span("export assets", assets=len(commands)):
+            results = mworkers.run(
+                commands,
+                onProgress=lambda i, e: tracker.update(e.done, source=i),
+            )
+    ui.update().close()
+
+    for r in results:
+        r.print()
+    if failed := [a for a, r in zip(filenames, results) if not r.succeeded]:
+        raise RuntimeError(f"Failed to export: {', '.join(failed)}")
+
+    # The workers wrote to the caches directory from other processes
+    fcatalog.VersionCatalog(cachesDir).invalidate()
+
+
+def exportAssets(dir: str, filenames: dict[str, str]) -> None:
+    """Export assets in a background job, from their JSON arguments"""
+    for asset, filename in filenames.items():
+        exportAsset(Asset(asset), dir=Path(dir), filename=filename)
+
+
+@mapp.logScriptEditorOutput
+def exportInBackground() -> mbackground.Job:
+    """Export every asset without blocking the Maya session
+
+    The assets' versions are reserved in this session, so exporting again
+    before the job finishes doesn't reuse them. They're released once the job
+    finishes, whether or not it succeeded.
+    """
+
+    shot, cachesDir = _findCachesDir()
+
+    catalog = fcatalog.VersionCatalog(cachesDir)
+    filenames = {}
+    reserved = []
+    for asset in Asset:
+        if not _isInScene(asset):
+            continue
+        filename = constructAssetFilename(asset, dir=cachesDir, shot=shot)
+        fileExt = _FILE_EXTS.get(asset, fname.FileExt.XML)
+        reserved.append(cachesDir / f"{filename}{fileExt}")
+        catalog.reserve(reserved[-1])
+        filenames[f"{asset}"] = filename
+
+    ui = mui.ProgressWindow("progressWindow", "Cache & Camera Exporter")
+    ui.build().initialize(
+        f"Exporting {len(filenames)} caches & camera in the background to:"
+        f"\n{cachesDir}"
+    ).update().show()
+
+    job = mbackground.submit(
+        exportAssets,
+        onStatus=mbackground.reportTo(ui),
+        dir=cachesDir.as_posix(),
+        filenames=filenames,
+    )
+    job.whenFinished(lambda *_: catalog.release(*reserved))
+    return job
+
+
 ################################################################################
 # Import
 ################################################################################
@@ -136,15 +361,8 @@ def _findLatestVersionFile(
 ) -> Path | None:
     """Get the file path to the asset's latest version"""
 
-    filenameBase = fname.constructFilenameBase(
-        shot, assetName=assetName, assetType=assetType
-    )
-    validator = fname.constructValidator(
-        filenameBase, assetName=assetName, assetType=assetType
-    )
-    return fpath.findLatestVersionAsset(
-        validator,
-        files=fpath.findShotFiles(shot, directory=dir),
+    return fcatalog.VersionCatalog(dir).latestFile(
+        shot, assetType=assetType, assetName=assetName
     )
 
 
@@ -179,6 +397,17 @@ def _importGeometryCache(
     rec.geometryCache.assetize(assetName, namespace=namespace)
 
 
+def _applyAlembicCache(geometryGrp: mobj.DAGNode, file: Path) -> None:
+    """Connect an Alembic cache to the geometry with matching names
+
+    Caches exported in a single pass are Alembic caches, not geometry caches.
+    """
+
+    mapp.loadPlugin("AbcImport")
+    root = cmds.ls(geometryGrp, long=True)[0]
+    cmds.AbcImport(file.as_posix(), mode="import", connect=root)
+
+
 def _replaceRigWithCachedModel(
     assetName: fname.NameIdentifier,
     model: Path,
@@ -195,17 +424,20 @@ def _replaceRigWithCachedModel(
         geometry=geometryGrp,
     )
 
-    try:
-        container = mobj.lsWithWildcard(namespace, type="container")[0]
-    except IndexError:
+    if cache.suffix == fname.FileExt.ALEMBIC:
+        # The cache drives the world space xforms, so leave them to it
+        _applyAlembicCache(geometryGrp, file=cache)
+        return
+
+    if containers := mobj.lsWithWildcard(namespace, type="container"):
+        cmds.setAttr(f"{containers[0]}.filename", cache.stem, type="string")
+    else:
         _importGeometryCache(
             geometryGrp,
             assetName=assetName,
             file=cache,
             namespace=namespace,
         )
-    else:
-        cmds.setAttr(f"{container}.filename", cache.stem, type="string")
 
     # The cache saved world space positions, so get rid of geometry's xforms
     for c in mobj.lsChildren(geometryGrp):
@@ -232,10 +464,7 @@ def _buildWindow_i(outputPath: Path) -> mui.ProgressWindow:
 @mapp.SuspendedRedraw()
 @mapp.logScriptEditorOutput
 def import_() -> None:
-    shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
-    shotDir = fpath.findShotPath(shot, parentDir=fpath.findSharedDrive())
-    cachesDir = shotDir / fpath.CACHES_DIR
-    # cachesDir = fpath.getScenePath().parents[1] / "cache"
+    shot, cachesDir = _findCachesDir()
 
     findLatestVersionFileCmd = partial(
         _findLatestVersionFile, cachesDir, shot=shot
@@ -249,7 +478,7 @@ def import_() -> None:
     ):
         _replaceRigWithCachedModel(
             mechanicName,
-            model=rec.reference.getModelPathCmd(mechanicName),
+            model=rec.reference.getModelPath(mechanicName),
             cache=mechanicCache,
             geometryGrp=mobj.MECHANIC_MODEL_GEO_GRP,
         )
@@ -261,7 +490,7 @@ def import_() -> None:
     ):
         _replaceRigWithCachedModel(
             robotName,
-            model=rec.reference.getModelPathCmd(robotName),
+            model=rec.reference.getModelPath(robotName),
             cache=robotCache,
             geometryGrp=mobj.ROBOT_MODEL_GEO_GRP,
         )
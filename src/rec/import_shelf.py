@@ -25,6 +25,11 @@ def main() -> None:
         mel.eval(f'deleteShelfTab "{_SHELF_NAME}"')
     mel.eval(f'loadNewShelf "{_SHELF_FILE.as_posix()}"')
 
+    import rec.camera  # Only once the scripts are on the path
+
+    # Ready for the first camera export, without delaying the shelf
+    cmds.evalDeferred(rec.camera.startHelpers, lowestPriority=True)
+
     mayaVersion = cmds.about(version=True)
     envDir = Path(os.environ["MAYA_APP_DIR"], mayaVersion, "Maya.env")
     try:
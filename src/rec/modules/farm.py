@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+import rec.modules.queue as mqueue
+
+QUEUE_FILENAME = "queue.jsonl"
+LEASES_DIR = "leases"
+DONE_DIR = "done"
+
+DEFAULT_LEASE_DURATION = mqueue.DEFAULT_LEASE_DURATION
+
+Renderer = Callable[[Any], int]
+
+
+def getQueue(queueDir: Path) -> mqueue.JobQueue:
+    return mqueue.JobQueue(
+        queueDir / QUEUE_FILENAME, leasesDir=queueDir / LEASES_DIR
+    )
+
+
+def dispatch(queueDir: Path, items: Iterable[Any]) -> list[str]:
+    """Add jobs to the farm's queue, returning their job IDs"""
+    queueDir.joinpath(LEASES_DIR).mkdir(parents=True, exist_ok=True)
+    return getQueue(queueDir).enqueue(*items)
+
+
+def isGroupDone(queue: mqueue.JobQueue, group: str) -> bool:
+    """Check that none of a group's jobs, e.g. a shot's chunks, are left"""
+
+    queue.refresh()
+    return not any(
+        isinstance(item, dict) and item.get("group") == group
+        for jobs in (queue.pending, queue.claimed, queue.failed)
+        for item in jobs.values()
+    )
+
+
+def getDoneFile(queueDir: Path, group: str) -> Path:
+    return queueDir / DONE_DIR / f"{group}.json"
+
+
+def reclaimExpired(
+    queue: mqueue.JobQueue, leaseDuration: float = DEFAULT_LEASE_DURATION
+) -> list[str]:
+    """Requeue the jobs of workers whose leases weren't renewed in time
+
+    A worker renews its lease while it runs, so an expired or missing lease
+    means the worker's machine crashed or lost the drive.
+    """
+    return queue.requeueExpired(leaseDuration)
+
+
+class Worker:
+    """Render node that claims jobs from a queue shared by several machines
+
+    While it runs, the worker renews a lease file in the queue directory
+    every so often. The queue directory must be on a drive whose file locks
+    are shared between machines, e.g. a network share.
+    """
+
+    def __init__(
+        self,
+        queueDir: Path,
+        render: Renderer,
+        name: str | None = None,
+        leaseDuration: float = DEFAULT_LEASE_DURATION,
+    ) -> None:
+        self.queueDir = queueDir
+        self.render = render
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.leaseDuration = leaseDuration
+        self.heartbeatInterval = leaseDuration / 4
+
+        self.queue = getQueue(queueDir)
+        self.leaseFile = mqueue.getLeaseFile(
+            self.queue.leasesDir, owner=self.name
+        )
+        self._stopped = threading.Event()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.queueDir!r}, {self.name!r})"
+
+    def _renewLease(self, job: mqueue.Job | None = None) -> None:
+        info = {"worker": self.name, "time": time.time()}
+        if job is not None:
+            info |= {"job": job.id, "item": job.item}
+        tempFile = self.leaseFile.with_name(f"{self.leaseFile.name}~")
+        tempFile.write_text(json.dumps(info), encoding="utf-8")
+        os.replace(tempFile, self.leaseFile)
+
+    def _heartbeat(self) -> None:
+        while not self._stopped.wait(self.heartbeatInterval):
+            try:
+                os.utime(self.leaseFile)
+            except OSError:
+                continue  # Try again on the next beat
+
+    def _runJob(self, job: mqueue.Job) -> bool:
+        self._renewLease(job)
+        print(f"{self.name}: rendering {job.item}")
+        start = time.perf_counter()
+        try:
+            returncode = self.render(job.item)
+        except Exception:
+            traceback.print_exc()
+            returncode = -1
+        seconds = time.perf_counter() - start
+
+        try:
+            if returncode:
+                self.queue.fail(
+                    job.id,
+                    reason=f"Renderer returned {returncode}",
+                    owner=self.name,
+                    seconds=seconds,
+                )
+            else:
+                self.queue.ack(job.id, owner=self.name, seconds=seconds)
+        except KeyError:  # The lease expired, so the job was requeued
+            print(f"{self.name}: {job.item} was reclaimed by another worker")
+            return False
+        finally:
+            self._renewLease()
+
+        if returncode:
+            return False
+        if isinstance(job.item, dict) and "group" in job.item:
+            self._markGroupDone(job.item)
+        return True
+
+    def _markGroupDone(self, item: dict[str, Any]) -> None:
+        """Record a group as done once none of its jobs are left"""
+
+        group = item["group"]
+        if not isGroupDone(self.queue, group):
+            return
+        doneFile = getDoneFile(self.queueDir, group=group)
+        doneFile.parent.mkdir(exist_ok=True)
+        chunkKeys = {"start", "end", "chunk"}
+        info = {k: v for k, v in item.items() if k not in chunkKeys}
+        doneFile.write_text(
+            json.dumps({**info, "worker": self.name, "time": time.time()}),
+            encoding="utf-8",
+        )
+        print(f"{self.name}: finished {group}")
+
+    def run(self, keepRunning: bool = False, pollInterval: float = 30.0) -> int:
+        """Render jobs until the queue is empty, returning how many failed
+
+        If `keepRunning`, wait for new jobs instead of stopping.
+        """
+
+        self.leaseFile.parent.mkdir(parents=True, exist_ok=True)
+        self._renewLease()
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+
+        failed = 0
+        try:
+            while True:
+                reclaimExpired(self.queue, self.leaseDuration)
+                job = self.queue.claim(owner=self.name)
+                if job is not None:
+                    failed += not self._runJob(job)
+                elif keepRunning:
+                    time.sleep(pollInterval)
+                else:
+                    break
+        finally:
+            self._stopped.set()
+            heartbeat.join()
+            self.leaseFile.unlink(missing_ok=True)
+        return failed
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import json
+import os
+from collections.abc import Callable
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any
+
+import rec.modules.files.names as fname
+
+_MASTER_DIR = os.path.join("MAYA", "scenes")
+
+Entry = dict[str, Any]
+
+
+def _constructMasterPattern(assetName: str, assetType: str) -> str:
+    return f"{fname.SHOW}_asset_{assetName}_{assetType}_*.*_MASTER.m?"
+
+
+def _getMtime(path: Path | str) -> float | None:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+class AssetIndex:
+    """Index of the MASTER file of each asset on the assets drive
+
+    The assets drive is walked once, only as deep as the MASTER files, and the
+    index is persisted. Afterwards, an asset's folders are only searched again
+    when their modification times change, e.g. when a version is added.
+    """
+
+    instances: dict[Path, AssetIndex] = {}
+
+    def __new__(
+        cls, assetsDir: Path, getFile: Callable[[], Path]
+    ) -> AssetIndex:
+        """Only create one instance for each assets directory"""
+        if assetsDir not in cls.instances:
+            cls.instances[assetsDir] = super().__new__(cls)
+        return cls.instances[assetsDir]
+
+    def __init__(self, assetsDir: Path, getFile: Callable[[], Path]) -> None:
+        if hasattr(self, "assetsDir"):
+            return
+        self.assetsDir = assetsDir
+        self._getFile = getFile
+        self._entries: dict[str, Entry] | None = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.assetsDir!r})"
+
+    @staticmethod
+    def _constructKey(assetName: str, assetType: str) -> str:
+        return f"{assetName}|{assetType}".lower()
+
+    def _load(self) -> dict[str, Entry]:
+        if self._entries is not None:
+            return self._entries
+
+        try:
+            with self._getFile().open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("assetsDir") == f"{self.assetsDir}":
+            self._entries = data["entries"]
+        else:
+            self.build()
+        return self._entries  # type: ignore
+
+    def _save(self) -> None:
+        file = self._getFile()
+        tempFile = file.with_name(f"{file.name}~")
+        data = {"assetsDir": f"{self.assetsDir}", "entries": self._entries}
+        try:
+            with tempFile.open("w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tempFile, file)
+        except OSError:
+            pass  # The index still works for the rest of the session
+
+    def _indexType(self, typeDir: Path, assetName: str) -> Entry | None:
+        """Find the MASTER file among an asset type's versions
+
+        MASTER filenames have no version suffix to sort by, so the first one
+        found is taken, in directory order, like globbing for it would.
+        """
+
+        assetType = typeDir.name
+        pattern = _constructMasterPattern(assetName, assetType=assetType)
+        master = self._findFirstMaster(typeDir, pattern=pattern.lower())
+        if master is None:
+            return None
+        return {
+            "path": f"{master}",
+            "typeMtime": typeDir.stat().st_mtime,
+            "scenesMtime": _getMtime(master.parent),
+        }
+
+    @staticmethod
+    def _findFirstMaster(typeDir: Path, pattern: str) -> Path | None:
+        for versionDir in os.scandir(typeDir):
+            if "." not in versionDir.name or not versionDir.is_dir():
+                continue
+            scenesDir = os.path.join(versionDir.path, _MASTER_DIR)
+            try:
+                files = os.scandir(scenesDir)
+            except FileNotFoundError:
+                continue
+            with files:
+                for f in files:
+                    if fnmatchcase(f.name.lower(), pattern) and f.is_file():
+                        return Path(f.path)
+        return None
+
+    def build(self) -> AssetIndex:
+        """Walk the assets directory, indexing every asset's MASTER files"""
+
+        self._entries = {}
+        for assetDir in os.scandir(self.assetsDir):
+            if not assetDir.is_dir():
+                continue
+            for typeDir in os.scandir(assetDir.path):
+                if not typeDir.is_dir():
+                    continue
+                entry = self._indexType(Path(typeDir.path), assetDir.name)
+                if entry is not None:
+                    key = self._constructKey(assetDir.name, typeDir.name)
+                    self._entries[key] = entry
+        self._save()
+
+        return self
+
+    def find(
+        self, assetName: fname.NameIdentifier, assetType: fname.TypeIdentifier
+    ) -> Path | None:
+        """Get the path to an asset's MASTER file
+
+        Only the asset type's folder is searched again if it changed since it
+        was indexed.
+        """
+
+        entries = self._load()
+        key = self._constructKey(f"{assetName}", f"{assetType}")
+        typeDir = self.assetsDir.joinpath(
+            f"{assetName}".upper(), f"{assetType}".upper()
+        )
+
+        entry = entries.get(key)
+        if entry is not None:
+            master = Path(entry["path"])
+            if (
+                _getMtime(typeDir) == entry["typeMtime"]
+                and _getMtime(master.parent) == entry["scenesMtime"]
+            ):
+                return master
+
+        try:
+            entry = self._indexType(typeDir, assetName=f"{assetName}")
+        except FileNotFoundError:
+            entry = None
+        if entry is None:
+            entries.pop(key, None)
+            self._save()
+            return None
+        entries[key] = entry
+        self._save()
+
+        return Path(entry["path"])
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import os
+import re
+import shutil
+import struct
+import xml.etree.ElementTree as ET
+from collections.abc import Sequence
+from pathlib import Path
+from typing import BinaryIO
+
+import rec.modules.files.names as fname
+
+# Group tag: (size format, alignment)
+_GROUP_TAGS = {b"FOR4": (">I", 4), b"FOR8": (">Q", 8)}
+_END_TIME_TAG = b"ETIM"
+_RANGE_PATTERN = re.compile(r"^(-?\d+)-(-?\d+)$")
+
+
+class InvalidCacheFileError(ValueError):
+    """File is not a geometry cache written as one file"""
+
+    def __init__(self, file: Path) -> None:
+        super().__init__(f"Not a valid geometry cache: '{file}'")
+
+
+def _readHeader(f: BinaryIO, file: Path) -> bytes:
+    """Read the header block, leaving the file at the first frame block
+
+    A 64-bit cache may pad tags and blocks to 8 bytes, so each layout is
+    tried. The right one is followed by another block or the end of the file.
+    """
+
+    groupTag = f.read(4)
+    try:
+        sizeFormat, alignment = _GROUP_TAGS[groupTag]
+    except KeyError:
+        raise InvalidCacheFileError(file)
+    sizeLength = struct.calcsize(sizeFormat)
+    start = f.read(4 + sizeLength)
+    fileSize = os.fstat(f.fileno()).st_size
+
+    for padding in (0, 4) if alignment == 8 else (0,):
+        try:
+            (size,) = struct.unpack_from(sizeFormat, start, padding)
+        except struct.error:
+            continue
+        end = 4 + padding + sizeLength + size
+        for end in dict.fromkeys((end, end + -end % alignment)):
+            if end > fileSize:
+                continue
+            f.seek(end)
+            if end == fileSize or f.read(4) == groupTag:
+                f.seek(0)
+                return f.read(end)
+    raise InvalidCacheFileError(file)
+
+
+def _readRange(xmlFile: Path) -> tuple[ET.ElementTree, int, int]:
+    tree = ET.parse(xmlFile)
+    time = tree.getroot().find("time")
+    timeRange = "" if time is None else time.get("Range", "")
+    if (match := _RANGE_PATTERN.match(timeRange)) is None:
+        raise InvalidCacheFileError(xmlFile)
+    return tree, int(match[1]), int(match[2])
+
+
+def merge(chunkXmlFiles: Sequence[Path], xmlFile: Path) -> None:
+    """Merge consecutive geometry caches into one description and cache file
+
+    Each chunk must be written as one file, in the same format, for the same
+    geometry. The frame blocks are copied without being decoded, and every
+    channel's start and end times are those of the merged range.
+    """
+
+    chunks = sorted(
+        (_readRange(x) + (x,) for x in chunkXmlFiles), key=lambda c: c[1]
+    )
+    tree, start = chunks[0][0], chunks[0][1]
+    end = chunks[-1][2]
+
+    cacheFiles = [
+        c[-1].with_suffix(fname.FileExt.MAYA_CACHE.value) for c in chunks
+    ]
+    firstFile, lastFile = cacheFiles[0], cacheFiles[-1]
+    with firstFile.open("rb") as f:
+        header = _readHeader(f, firstFile)
+    with lastFile.open("rb") as f:
+        lastHeader = _readHeader(f, lastFile)
+
+    # Only the end time differs, and it is the header's last chunk
+    header = (
+        header[: header.index(_END_TIME_TAG)]
+        + lastHeader[lastHeader.index(_END_TIME_TAG) :]
+    )
+
+    cacheFile = xmlFile.with_suffix(fname.FileExt.MAYA_CACHE.value)
+    with cacheFile.open("wb") as merged:
+        merged.write(header)
+        for c in cacheFiles:
+            with c.open("rb") as f:
+                _readHeader(f, c)
+                shutil.copyfileobj(f, merged)
+
+    timeRange = f"{start}-{end}"
+    tree.getroot().find("time").set("Range", timeRange)  # type: ignore
+    for element in tree.getroot().iter():
+        if "SamplingRange" in element.attrib:
+            element.set("SamplingRange", timeRange)
+        if element.tag.startswith("channel"):  # Not the Channels group
+            element.set("StartTime", f"{start}")
+            element.set("EndTime", f"{end}")
+    tree.write(xmlFile, encoding="utf-8", xml_declaration=True)
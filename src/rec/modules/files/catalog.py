@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+from pathlib import Path
+from typing import Union
+
+import rec.modules.files.manifest as fmanifest
+import rec.modules.files.names as fname
+import rec.modules.timing as mtiming
+
+_AssetKey = tuple[str, Union[str, None], str]
+_Version = tuple[int, int, Path]
+
+
+def _sortKey(version: _Version) -> tuple[int, int, str]:
+    return version[0], version[1], version[2].name
+
+
+class VersionCatalog:
+    """Index of the versioned files in a directory
+
+    The directory is scanned once, and every file formatted
+    'rec_seq###_name_type_v###.ext' is indexed by its shot, asset name, asset
+    type, and file extension. The directory is only scanned again when its
+    modification time changes or the catalog is invalidated.
+
+    If the directory's manifest is up to date, it is read instead of scanning
+    the directory. Otherwise, the manifest is rebuilt after the scan.
+
+    Files still being exported, e.g. by a background job, can be reserved,
+    so their versions aren't reused. Reservations are kept when the index is
+    refreshed, until they are released.
+    """
+
+    instances: dict[Path, VersionCatalog] = {}
+
+    def __new__(cls, directory: Path) -> VersionCatalog:
+        """Only create one instance for each directory"""
+        if directory not in cls.instances:
+            cls.instances[directory] = super().__new__(cls)
+        return cls.instances[directory]
+
+    def __init__(self, directory: Path) -> None:
+        if hasattr(self, "directory"):
+            return
+        self.directory = directory
+        self._index: dict[_AssetKey, dict[str, _Version]] = {}
+        self._mtimes: tuple[float, float | None] | None = None
+        self._reserved: set[Path] = set()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.directory!r})"
+
+    def invalidate(self) -> None:
+        """Force the catalog to refresh on the next query"""
+        self._mtimes = None
+
+    def refresh(self) -> VersionCatalog:
+        """Scan the directory if it changed since it was last scanned"""
+
+        mtimes = fmanifest.getMtimes(self.directory)
+        if mtimes == self._mtimes:
+            return self
+
+        self._index.clear()
+        if fmanifest.isFresh(mtimes):
+            with mtiming.span("read manifest", directory=self.directory):
+                for e in fmanifest.readEntries(self.directory):
+                    self.add(self.directory / e["filename"])
+        else:
+            with mtiming.span("scan caches", directory=self.directory):
+                files = list(self.directory.iterdir())
+                for f in files:
+                    self.add(f)
+            try:
+                fmanifest.rebuild(self.directory, files=files)
+            except OSError:
+                pass  # The manifest only saves future scans
+            else:
+                mtimes = fmanifest.getMtimes(self.directory)
+        self._mtimes = mtimes
+        for f in self._reserved:
+            self.add(f)
+
+        return self
+
+    def add(self, file: Path) -> None:
+        """Index a file if it is newer than the indexed version"""
+
+        parsed = fname.VersionedFilename.parse(file)
+        if parsed is None:
+            return
+
+        key = parsed.shot, parsed.assetName, parsed.assetType
+        versions = self._index.setdefault(key, {})
+        version = parsed.version, parsed.subVersion, file
+        latest = versions.get(parsed.fileExt)
+        if latest is None or _sortKey(version) > _sortKey(latest):
+            versions[parsed.fileExt] = version
+
+    def reserve(self, file: Path) -> None:
+        """Index a file that is yet to be written, until it is released"""
+        self._reserved.add(file)
+        self.add(file)
+
+    def release(self, *files: Path) -> None:
+        """Drop reservations, e.g. once their files are written"""
+        self._reserved.difference_update(files)
+        self.invalidate()
+
+    def _findLatest(
+        self,
+        shot: fname.ShotId,
+        assetType: fname.TypeIdentifier,
+        assetName: fname.NameIdentifier | None,
+    ) -> _Version | None:
+        self.refresh()
+
+        key = shot.name, f"{assetName}" if assetName else None, f"{assetType}"
+        versions = self._index.get(key, {})
+        fileExts = fname.getFileExts(assetName, assetType=assetType)
+        latest = [versions[e] for e in fileExts if e in versions]
+        if not latest:
+            return None
+        return max(latest, key=_sortKey)
+
+    def latestVersion(
+        self,
+        shot: fname.ShotId,
+        assetType: fname.TypeIdentifier,
+        assetName: fname.NameIdentifier | None = None,
+    ) -> int:
+        """Get the asset's latest version number, or 0 if there is none"""
+
+        latest = self._findLatest(shot, assetType, assetName=assetName)
+        return 0 if latest is None else latest[0]
+
+    def nextVersion(
+        self,
+        shot: fname.ShotId,
+        assetType: fname.TypeIdentifier,
+        assetName: fname.NameIdentifier | None = None,
+    ) -> int:
+        """Get the asset's next version number"""
+        return self.latestVersion(shot, assetType, assetName=assetName) + 1
+
+    def latestFile(
+        self,
+        shot: fname.ShotId,
+        assetType: fname.TypeIdentifier,
+        assetName: fname.NameIdentifier | None = None,
+    ) -> Path | None:
+        """Get the file path to the asset's latest version"""
+
+        latest = self._findLatest(shot, assetType, assetName=assetName)
+        return None if latest is None else latest[2]
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import json
+import os
+import tempfile
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+import rec.modules.files.names as fname
+import rec.modules.queue as mqueue
+
+FILENAME = f"{fname.SHOW}_manifest.jsonl"
+
+Entry = dict[str, Any]
+
+
+def getPath(directory: Path) -> Path:
+    return directory / FILENAME
+
+
+def _getLock(directory: Path) -> mqueue.FileLock:
+    """Lock a directory's manifest, so appends aren't lost to a rebuild"""
+    return mqueue.FileLock(directory / f"{FILENAME}.lock")
+
+
+def _constructEntry(
+    file: Path,
+    frameRange: Sequence[float] | None = None,
+    nodes: Sequence[str] | None = None,
+) -> Entry | None:
+    parsed = fname.VersionedFilename.parse(file)
+    if parsed is None:
+        return None
+
+    entry: Entry = {"filename": file.name, "version": parsed.version}
+    if frameRange is not None:
+        entry["frameRange"] = list(frameRange)
+    if nodes is not None:
+        entry["nodes"] = list(nodes)
+    return entry
+
+
+def record(
+    file: Path, frameRange: Sequence[float], nodes: Sequence[str]
+) -> None:
+    """Append a published file to its directory's manifest
+
+    If the directory has no manifest yet, one is built from the files already
+    in the directory so that older versions are not hidden by the new one.
+
+    The file is fingerprinted by its size and modification time, instead of
+    reading all of it back from the drive.
+    """
+
+    entry = _constructEntry(file, frameRange=frameRange, nodes=nodes)
+    if entry is None:
+        raise fname.InvalidFilenameError(
+            f"Filename {file.name!r} must match pattern: "
+            "'rec_seq###_name_type_v###'"
+        )
+    stat = file.stat()
+    entry["size"] = stat.st_size
+    entry["mtime"] = stat.st_mtime
+
+    directory = file.parent
+    manifest = getPath(directory)
+    with _getLock(directory):
+        if not manifest.exists():
+            files = (f for f in directory.iterdir() if f != file)
+            _rebuild(directory, files=files)
+
+        # A single write keeps concurrent appends from interleaving
+        with manifest.open("a", encoding="utf-8") as f:
+            f.write(f"{json.dumps(entry)}\n")
+
+
+def getMtimes(directory: Path) -> tuple[float, float | None]:
+    """Get the modification times of a directory and its manifest"""
+
+    try:
+        manifestMtime = getPath(directory).stat().st_mtime
+    except FileNotFoundError:
+        manifestMtime = None
+    return directory.stat().st_mtime, manifestMtime
+
+
+def isFresh(mtimes: tuple[float, float | None]) -> bool:
+    """Check if the directory didn't change after its manifest was written"""
+
+    directoryMtime, manifestMtime = mtimes
+    return manifestMtime is not None and manifestMtime >= directoryMtime
+
+
+def read(directory: Path) -> list[Entry] | None:
+    """Read a directory's manifest
+
+    If the manifest is missing, or the directory changed after the manifest
+    was last written, the manifest can't be trusted and None is returned.
+    """
+
+    if not isFresh(getMtimes(directory)):
+        return None
+    return readEntries(directory)
+
+
+def readEntries(directory: Path) -> list[Entry]:
+    """Read a directory's manifest without checking if it is up to date"""
+
+    with getPath(directory).open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def rebuild(directory: Path, files: Iterable[Path]) -> None:
+    """Rewrite a directory's manifest to match the files in the directory
+
+    Entries for files that no longer exist are dropped, and files that were
+    never recorded are added without their export details. Entries recorded
+    since the files were listed are kept.
+    """
+
+    with _getLock(directory):
+        _rebuild(directory, files=files)
+
+
+def _rebuild(directory: Path, files: Iterable[Path]) -> None:
+    manifest = getPath(directory)
+    try:
+        entries = {e["filename"]: e for e in readEntries(directory)}
+    except FileNotFoundError:
+        entries = {}
+
+    lines = []
+    for file in files:
+        entry = entries.pop(file.name, None) or _constructEntry(file)
+        if entry is not None:
+            lines.append(f"{json.dumps(entry)}\n")
+    lines += (
+        f"{json.dumps(e)}\n"
+        for filename, e in entries.items()
+        if directory.joinpath(filename).exists()
+    )
+
+    # Unique, so concurrent rebuilds don't write over each other's file
+    with tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=directory,
+        prefix=f"{FILENAME}.",
+        suffix="~",
+        delete=False,
+    ) as f:
+        tempManifest = Path(f.name)
+        succeeded = False
+        try:
+            f.writelines(lines)
+            succeeded = True
+        finally:
+            if not succeeded:
+                f.close()
+                tempManifest.unlink()
+    # Temporary files are private, but the manifest is shared
+    tempManifest.chmod(0o644)
+    os.replace(tempManifest, manifest)
+
+    # Replacing the manifest touches the directory, so stay newer than it
+    os.utime(manifest)
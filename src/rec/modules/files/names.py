@@ -2,10 +2,11 @@ from __future__ import annotations
 
 __author__ = "Charles Mesa Cayobit"
 
+import re
 from collections.abc import Callable, Iterable
-from functools import partial
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Union
+from typing import NamedTuple, Union
 
 import rec.modules.stringEnum as strEnum
 
@@ -116,6 +117,19 @@ def hasAnyEtension(file: Path, fileExts: set[FileExt]) -> bool:
     return file.suffix in fileExts
 
 
+def getFileExts(
+        assetName: NameIdentifier | None, assetType: TypeIdentifier
+) -> set[FileExt]:
+    """Get the file extensions an asset can be saved as"""
+
+    if assetType != AssetType.CACHE:
+        return {FileExt.MAYA_BINARY, FileExt.MAYA_ASCII}
+    elif assetName != AssetName.ROBOT_FACE:
+        return {FileExt.MAYA_CACHE, FileExt.XML, FileExt.ALEMBIC}
+    else:
+        return {FileExt.ALEMBIC}
+
+
 def constructValidator(
         filenameBase: str,
         assetName: NameIdentifier | None,
@@ -123,31 +137,96 @@ def constructValidator(
 ) -> Validator:
     """Construct a validator used for filtering assets"""
 
-    if assetType != AssetType.CACHE:
-        fileExtValidator = partial(
-            hasAnyEtension,
-            fileExts={FileExt.MAYA_BINARY, FileExt.MAYA_ASCII},
-        )
-    elif assetName != AssetName.ROBOT_FACE:
-        fileExtValidator = partial(
-            hasAnyEtension,
-            fileExts={FileExt.MAYA_CACHE, FileExt.XML},
-        )
-    else:
-        fileExtValidator = partial(hasExtension, fileExt=FileExt.ALEMBIC)
+    fileExtValidator = partial(
+        hasAnyEtension, fileExts=getFileExts(assetName, assetType=assetType)
+    )
     return lambda f: inFilename(filenameBase, file=f) and fileExtValidator(f)
 
 
+def formatVersionSuffix(version: int, versionIndicator: str = "v") -> str:
+    """Format a version number as 'v###'"""
+    return f"{versionIndicator}{f'{version}'.zfill(3)}"
+
+
+@lru_cache(maxsize=None)
+def _compileVersionPattern(versionIndicator: str = "v") -> re.Pattern[str]:
+    return re.compile(
+        rf"_{re.escape(versionIndicator)}"
+        r"(?P<version>\d+)(?:\.(?P<subVersion>\d+))?(?=_|$)"
+    )
+
+
+class VersionKey(NamedTuple):
+    """Numeric version parsed from a filename, formatted 'v###' or 'v###.#'"""
+
+    version: int
+    subVersion: int = 0
+
+    @classmethod
+    def parse(cls, stem: str, versionIndicator: str = "v") -> VersionKey | None:
+        """Parse the version from a filename stem, or return None if missing"""
+
+        match = _compileVersionPattern(versionIndicator).search(stem)
+        if match is None:
+            return None
+        return cls(int(match["version"]), int(match["subVersion"] or 0))
+
+
+_UNVERSIONED = VersionKey(-1, -1)
+
+
+def versionSortKey(file: Path) -> tuple[VersionKey, str]:
+    """Sort files by their numeric version, then by name
+
+    Unlike sorting by name, 'v1000' is sorted after 'v999'.
+    """
+
+    return VersionKey.parse(file.stem) or _UNVERSIONED, file.name
+
+
 def constructVersionSuffix(
         validator: Validator, files: Iterable[Path], versionIndicator: str = "v"
 ) -> str:
     """Construct a filename version, formatted 'v###'"""
-    
-    filenames = {f.stem for f in files if validator(f)}
-    try:
-        filename = sorted(filenames)[-1]
-    except IndexError:
-        version = 0
-    else:
-        version = int(filename.rsplit(versionIndicator, 1)[-1])
-    return f"{versionIndicator}{f'{version + 1}'.zfill(3)}"
+
+    versions = (
+        VersionKey.parse(f.stem, versionIndicator=versionIndicator)
+        for f in files
+        if validator(f)
+    )
+    latest = max((v for v in versions if v is not None), default=None)
+    version = 0 if latest is None else latest.version
+    return formatVersionSuffix(version + 1, versionIndicator=versionIndicator)
+
+
+_VERSIONED_FILENAME_PATTERN = re.compile(
+    rf"^{SHOW}_(?P<shot>[A-Za-z]{{3}}\d{{3}})_(?:(?P<assetName>.+)_)?"
+    r"(?P<assetType>[^_]+)_v(?P<version>\d+)(?:\.(?P<subVersion>\d+))?$"
+)
+
+
+class VersionedFilename(NamedTuple):
+    """Fields of a filename formatted 'rec_seq###_name_type_v###.ext'"""
+
+    shot: str
+    assetName: str | None
+    assetType: str
+    version: int
+    subVersion: int
+    fileExt: str
+
+    @classmethod
+    def parse(cls, file: Path) -> VersionedFilename | None:
+        """Parse a file's name, or return None if it isn't versioned"""
+
+        match = _VERSIONED_FILENAME_PATTERN.match(file.stem)
+        if match is None:
+            return None
+        return cls(
+            match["shot"],
+            assetName=match["assetName"],
+            assetType=match["assetType"],
+            version=int(match["version"]),
+            subVersion=int(match["subVersion"] or 0),
+            fileExt=file.suffix,
+        )
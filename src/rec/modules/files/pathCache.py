@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import json
+import os
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+DEFAULT_TTL = 24 * 60 * 60  # Seconds
+
+
+class PathCache:
+    """Process-wide memo of resolved directories, persisted to a JSON file
+
+    Entries expire after the TTL, or as soon as their directory is gone, so a
+    moved or remounted drive or a renamed shot folder is found again without
+    having to invalidate the cache by hand.
+    """
+
+    __slots__ = "_getFile", "_file", "_entries", "ttl"
+
+    def __init__(
+        self, getFile: Callable[[], Path], ttl: float = DEFAULT_TTL
+    ) -> None:
+        """The file is only located and read on the first lookup"""
+        self._getFile = getFile
+        self._file: Path | None = None
+        self._entries: dict[str, tuple[str, float]] | None = None
+        self.ttl = ttl
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._getFile!r}, ttl={self.ttl})"
+
+    @property
+    def file(self) -> Path:
+        if self._file is None:
+            self._file = self._getFile()
+        return self._file
+
+    def _load(self) -> dict[str, tuple[str, float]]:
+        if self._entries is None:
+            try:
+                with self.file.open("r", encoding="utf-8") as f:
+                    entries = json.load(f)
+                self._entries = {k: tuple(v) for k, v in entries.items()}
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        # Unique, so parallel mayapy workers don't write over each other's file
+        try:
+            fd, tempName = tempfile.mkstemp(
+                dir=self.file.parent, prefix=f"{self.file.name}.", suffix="~"
+            )
+        except OSError:
+            return  # The memo still works for the rest of the session
+        tempFile = Path(tempName)
+        succeeded = False
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tempFile, self.file)
+            succeeded = True
+        except OSError:
+            pass
+        finally:
+            if not succeeded:
+                tempFile.unlink(missing_ok=True)
+
+    def get(self, key: str) -> Path | None:
+        """Get a cached directory, or None if it is missing, expired, or gone"""
+
+        entries = self._load()
+        try:
+            path, cachedAt = entries[key]
+        except KeyError:
+            return None
+        if time.time() - cachedAt > self.ttl:
+            del entries[key]
+            return None
+        if not Path(path).is_dir():  # Moved or renamed since
+            del entries[key]
+            self._save()
+            return None
+        return Path(path)
+
+    def set(self, key: str, path: Path) -> Path:
+        """Cache a path, then return it"""
+
+        self._load()[key] = f"{path}", time.time()
+        self._save()
+        return path
+
+    def invalidate(self, key: str | None = None) -> None:
+        """Remove a cached path, or all of them if no key is provided"""
+
+        entries = self._load()
+        if key is None:
+            entries.clear()
+        else:
+            entries.pop(key, None)
+        self._save()
@@ -9,7 +9,10 @@ from pathlib import Path
 from typing import NoReturn
 
 import maya.cmds as cmds
+import rec.modules.files.assetIndex as fassets
 import rec.modules.files.names as fname
+import rec.modules.files.pathCache as fcache
+import rec.modules.timing as mtiming
 
 MAIN_GDRIVE = "REC"
 POST_PRODUCTION_GDRIVE = "REC_POST"
@@ -40,28 +43,22 @@ def getScenePath() -> Path:
 def findShotFiles(shot: fname.ShotId, directory: Path) -> tuple[Path, ...]:
     """Filter shot files in the provided directory
 
-    The internal list is sorted so the last item is the latest version,
-    then it is returned as a tuple.
+    The files are not sorted. Versions are compared numerically when they are
+    resolved, so sorting by name would be wasted work.
     """
 
-    files = [
+    return tuple(
         f
         for f in directory.iterdir()
         if f.is_file() and fname.inFilename(shot, file=f)
-    ]
-    files.sort(key=lambda f: f.name)
-    return tuple(files)
+    )
 
 
 def findLatestVersionAsset(
         validator: fname.Validator, files: Iterable[Path]
 ) -> Path | None:
     """Get the file path to the asset's latest version"""
-
-    file = None
-    for file in filter(validator, files):
-        continue
-    return file
+    return max(filter(validator, files), key=fname.versionSortKey, default=None)
 
 
 class DirectoryNotFoundError(FileNotFoundError):
@@ -71,14 +68,37 @@ class DirectoryNotFoundError(FileNotFoundError):
         super().__init__(f"Directory not found: '{directory}'")
 
 
+def _getPathCacheFile() -> Path:
+    userAppDir = cmds.internalVar(userAppDir=True)
+    return Path(userAppDir, f"{fname.SHOW}_resolvedPaths.json")
+
+
+_pathCache = fcache.PathCache(_getPathCacheFile)
+
+
+def invalidatePathCache() -> None:
+    """Find the shared drives and shot directories again on the next lookup"""
+    _pathCache.invalidate()
+
+
 def findSharedDrive(
         *, drive: str = "G", directory: str = POST_PRODUCTION_GDRIVE
 ) -> Path | NoReturn:
     """Get the path to re:connection's Google shared drive
 
-    By default, it gets the post-production shared drive.
+    By default, it gets the post-production shared drive. The path is cached,
+    so the drive is only searched for once per session.
     """
 
+    key = f"sharedDrive|{drive}|{directory}"
+    if path := _pathCache.get(key):
+        return path
+    with mtiming.span("resolve drive", directory=directory):
+        path = _findSharedDrive(drive, directory=directory)
+    return _pathCache.set(key, path)
+
+
+def _findSharedDrive(drive: str, directory: str) -> Path | NoReturn:
     if sys.platform == "win32":
         path = Path(f"{drive}:", "Shared drives", directory)
         if path.is_dir():
@@ -92,11 +112,23 @@ def findSharedDrive(
         raise DirectoryNotFoundError(f"~/{pathPattern}/{directory}")
 
 
-# TODO: cleaner way to do this?
+def _getAssetIndexFile() -> Path:
+    userAppDir = cmds.internalVar(userAppDir=True)
+    return Path(userAppDir, f"{fname.SHOW}_assetIndex.json")
+
+
 def findModelPath(assetName: fname.NameIdentifier, parentDir: Path) -> Path:
-    """Get the path to the model's master file"""
+    """Get the path to the model's master file
+
+    The path is looked up in an index of the assets drive instead of searching
+    every version folder of every asset.
+    """
 
     assetType = fname.AssetType.MODEL
+    index = fassets.AssetIndex(parentDir, getFile=_getAssetIndexFile)
+    if path := index.find(assetName, assetType=assetType):
+        return path
+
     filePathPattern = os.path.join(
         f"{assetName}".upper(),
         f"{assetType}".upper(),
@@ -105,15 +137,22 @@ def findModelPath(assetName: fname.NameIdentifier, parentDir: Path) -> Path:
         "scenes",
         f"rec_asset_{assetName}_{assetType}_*.*_MASTER.m?",
     )
-    for path in parentDir.glob(filePathPattern):
-        if path.is_file():
-            return path
     raise FileNotFoundError(parentDir / filePathPattern)
 
 
 def findShotPath(shot: fname.ShotId, parentDir: Path) -> Path | NoReturn:
-    """Get the path to the specific shot directory"""
+    """Get the path to the specific shot directory
+
+    The path is cached, so the directory is only searched for once per session.
+    """
+
+    key = f"shotPath|{parentDir}|{shot.name}"
+    if path := _pathCache.get(key):
+        return path
+    return _pathCache.set(key, _findShotPath(shot, parentDir=parentDir))
+
 
+def _findShotPath(shot: fname.ShotId, parentDir: Path) -> Path | NoReturn:
     def findDir(identifier: str, parentDir: Path) -> Path:
         for d in parentDir.iterdir():
             if d.is_dir() and d.stem.endswith(identifier):
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import json
+import os
+import re
+import tempfile
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+
+import rec.modules.frames as mframes
+import rec.modules.queue as mqueue
+
+# Signature at the start of each image format, and at the end if it has one
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_END = b"IEND\xaeB`\x82"
+_EXR_SIGNATURE = b"\x76\x2f\x31\x01"
+
+# Hashes of what each frame's image was made from, next to the images
+HASHES_EXT = ".hashes.json"
+
+
+def isCompleteImage(file: Path | str) -> bool:
+    """Check that an image was completely written, by its size and signature
+
+    A PNG must also end with its last chunk, in case writing it was cut short.
+    """
+
+    file = f"{file}"
+    ext = os.path.splitext(file)[1].lower()
+    try:
+        with open(file, "rb") as f:
+            if ext == ".png":
+                if f.read(len(_PNG_SIGNATURE)) != _PNG_SIGNATURE:
+                    return False
+                f.seek(-len(_PNG_END), os.SEEK_END)
+                return f.read() == _PNG_END
+            elif ext == ".exr":
+                return f.read(len(_EXR_SIGNATURE)) == _EXR_SIGNATURE
+            return os.fstat(f.fileno()).st_size > 0
+    except OSError:  # Missing, or too small to seek to its end
+        return False
+
+
+def findImageNumbers(dir: Path, name: str) -> set[int]:
+    """Find the numbers of the complete images of a 'name.###.ext' sequence"""
+
+    pattern = re.compile(
+        rf"{re.escape(name)}\.(\d+)\.(?:png|exr)", flags=re.IGNORECASE
+    )
+    numbers = set()
+    try:
+        files = os.scandir(dir)
+    except FileNotFoundError:
+        return numbers
+    with files:
+        for f in files:
+            if (match := pattern.fullmatch(f.name)) and isCompleteImage(f.path):
+                numbers.add(int(match[1]))
+    return numbers
+
+
+def findMissingFrameRanges(
+    frames: Iterable[int], frameRange: mframes.FrameRange
+) -> list[mframes.FrameRange]:
+    """Find the contiguous ranges of frames missing from an inclusive range"""
+
+    start, end = frameRange
+    frames = set(frames)
+    missing = []
+    rangeStart = None
+    for frame in range(start, end + 1):
+        if frame not in frames:
+            if rangeStart is None:
+                rangeStart = frame
+        elif rangeStart is not None:
+            missing.append((rangeStart, frame - 1))
+            rangeStart = None
+    if rangeStart is not None:
+        missing.append((rangeStart, end))
+    return missing
+
+
+def findUnrenderedFrameRanges(
+    dir: Path,
+    name: str,
+    frameRange: mframes.FrameRange,
+    firstFrame: int | None = None,
+) -> list[mframes.FrameRange]:
+    """Find the frames of a shot whose images are missing or incomplete
+
+    The images are numbered from 1 at the shot's first frame, as set by
+    `rec.renderSettings.setGlobals`. By default, the shot starts at the
+    range's start.
+    """
+
+    if firstFrame is None:
+        firstFrame = frameRange[0]
+    frames = (n + firstFrame - 1 for n in findImageNumbers(dir, name=name))
+    return findMissingFrameRanges(frames, frameRange=frameRange)
+
+
+def getHashesPath(dir: Path, name: str) -> Path:
+    return dir / f"{name}{HASHES_EXT}"
+
+
+def readFrameHashes(dir: Path, name: str) -> dict[int, str]:
+    """Read the hashes of the inputs each image of a sequence was made from"""
+
+    try:
+        with getHashesPath(dir, name=name).open("r", encoding="utf-8") as f:
+            return {int(frame): hash for frame, hash in json.load(f).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def recordFrameHashes(dir: Path, name: str, hashes: Mapping[int, str]) -> None:
+    """Record the hashes of the frames just made, keeping the others
+
+    The hashes are read and replaced under a lock, so exports of the same
+    sequence at once keep each other's.
+    """
+
+    file = getHashesPath(dir, name=name)
+    with mqueue.FileLock(file.with_name(f"{file.name}.lock")):
+        recorded = readFrameHashes(dir, name=name)
+        recorded.update(hashes)
+
+        # Unique, so no other writer's file is replaced by this one
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=dir,
+            prefix=f"{file.name}.",
+            suffix="~",
+            delete=False,
+        ) as f:
+            tempFile = Path(f.name)
+            succeeded = False
+            try:
+                json.dump({f"{k}": v for k, v in sorted(recorded.items())}, f)
+                succeeded = True
+            finally:
+                if not succeeded:
+                    f.close()
+                    tempFile.unlink()
+        # Temporary files are private, but the sequence is shared
+        tempFile.chmod(0o644)
+        os.replace(tempFile, file)
+
+
+def findChangedFrameRanges(
+    dir: Path, name: str, hashes: Mapping[int, str]
+) -> list[mframes.FrameRange]:
+    """Find the frames whose images are missing, incomplete, or were made
+    from other inputs than they would be now
+
+    The images are numbered by frame, and `hashes` are of each frame's
+    current inputs.
+    """
+
+    if not hashes:
+        return []
+    recorded = readFrameHashes(dir, name=name)
+    images = findImageNumbers(dir, name=name)
+    unchanged = (
+        frame
+        for frame, hash in hashes.items()
+        if frame in images and recorded.get(frame) == hash
+    )
+    return findMissingFrameRanges(unchanged, (min(hashes), max(hashes)))
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import math
+
+FrameRange = tuple[int, int]
+
+
+def toWholeFrames(start: float, end: float) -> FrameRange:
+    """Round a frame range out to whole frames"""
+    return math.floor(start), math.ceil(end)
+
+
+def split(start: float, end: float, count: int) -> list[FrameRange]:
+    """Split an inclusive frame range into contiguous chunks
+
+    The chunks are as even as possible. There are fewer chunks than requested
+    if there aren't enough frames.
+    """
+
+    start, end = toWholeFrames(start, end)
+    frameCount = end - start + 1
+    count = max(min(count, frameCount), 1)
+
+    chunkSize, remainder = divmod(frameCount, count)
+    chunks = []
+    for i in range(count):
+        chunkEnd = start + chunkSize + (i < remainder) - 1
+        chunks.append((start, chunkEnd))
+        start = chunkEnd + 1
+    return chunks
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import contextlib
+import hmac
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import traceback
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import Any
+
+from rec.modules.workers import Arg
+
+DEFAULT_IDLE_TIMEOUT = 30 * 60.0  # Seconds
+
+_HOST = "127.0.0.1"
+_CONNECT_TIMEOUT = 1.0
+
+Request = dict[str, Any]
+
+
+class HelperError(RuntimeError):
+    """The helper received the request, but failed to handle it"""
+
+
+def _writeEntry(file: Path, entry: dict[str, Any]) -> None:
+    """Write the helper's address where only the artist can read it"""
+
+    tempFile = file.with_name(f"{file.name}~")
+    fd = os.open(tempFile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tempFile, file)
+
+
+def _reply(request: bytes, token: str, handle: Callable[[Request], Any]) -> Any:
+    try:
+        message = json.loads(request)
+        if not hmac.compare_digest(f"{message.get('token')}", token):
+            return {"ok": False, "error": "Invalid token"}
+        return {"ok": True, "result": handle(message["request"])}
+    except Exception:
+        return {"ok": False, "error": traceback.format_exc()}
+
+
+def serve(
+    registryDir: Path,
+    handle: Callable[[Request], Any],
+    idleTimeout: float = DEFAULT_IDLE_TIMEOUT,
+) -> None:
+    """Handle requests from Maya sessions, one at a time, until idle
+
+    The helper listens on a local port and registers its address and a token
+    in the registry folder, marked busy while it handles a request. Each
+    request is one JSON line, and so is its reply.
+    """
+
+    registryDir.mkdir(parents=True, exist_ok=True)
+    entryFile = registryDir / f"{os.getpid()}.json"
+    token = secrets.token_hex(16)
+
+    with socket.create_server((_HOST, 0)) as server:
+        server.settimeout(idleTimeout)
+        entry = {"port": server.getsockname()[1], "token": token}
+        _writeEntry(entryFile, {**entry, "busy": False})
+        try:
+            while True:
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    break
+                _writeEntry(entryFile, {**entry, "busy": True})
+                with connection, connection.makefile("rwb") as f:
+                    reply = _reply(f.readline(), token=token, handle=handle)
+                    f.write(f"{json.dumps(reply)}\n".encode())
+                _writeEntry(entryFile, {**entry, "busy": False})
+        finally:
+            entryFile.unlink(missing_ok=True)
+
+
+def request(
+    registryDir: Path, request: Request, timeout: float | None = None
+) -> tuple[bool, Any]:
+    """Send a request to the first idle helper that answers
+
+    Returns whether a helper handled it, and its result. Busy helpers are
+    skipped, and helpers that don't answer are removed from the registry. If
+    a helper doesn't reply within the timeout, the request isn't handled.
+    """
+
+    entries: list[tuple[Path, dict[str, Any]]] = []
+    for entryFile in sorted(registryDir.glob("*.json")):
+        try:
+            entries.append(
+                (entryFile, json.loads(entryFile.read_text(encoding="utf-8")))
+            )
+        except (OSError, ValueError):
+            entryFile.unlink(missing_ok=True)
+
+    for entryFile, entry in entries:
+        if entry.get("busy"):
+            continue
+        try:
+            connection = socket.create_connection(
+                (_HOST, entry["port"]), timeout=_CONNECT_TIMEOUT
+            )
+        except (OSError, KeyError):
+            entryFile.unlink(missing_ok=True)
+            continue
+
+        message = {"token": entry.get("token"), "request": request}
+        try:
+            with connection, connection.makefile("rwb") as f:
+                connection.settimeout(timeout)
+                f.write(f"{json.dumps(message)}\n".encode())
+                f.flush()
+                reply = json.loads(f.readline())
+        except socket.timeout:  # Hung, or too slow to wait for
+            entryFile.unlink(missing_ok=True)
+            return False, None
+        except (OSError, ValueError):  # Quit or crashed before replying
+            entryFile.unlink(missing_ok=True)
+            continue
+
+        if not reply["ok"]:
+            raise HelperError(reply["error"])
+        return True, reply.get("result")
+    return False, None
+
+
+def getHelperPids(registryDir: Path) -> set[int]:
+    """Get the process IDs of the helpers in the registry"""
+    return {int(f.stem) for f in registryDir.glob("*.json") if f.stem.isdigit()}
+
+
+def start(
+    args: Sequence[Arg], logFile: Path | None = None
+) -> subprocess.Popen[bytes]:
+    """Start a helper in the background, detached from the Maya session
+
+    Its output is discarded, unless written to a log file.
+    """
+
+    if sys.platform == "win32":
+        options: dict[str, Any] = {
+            "creationflags": subprocess.DETACHED_PROCESS
+            | subprocess.CREATE_NEW_PROCESS_GROUP
+        }
+    else:
+        options = {"start_new_session": True}
+    with contextlib.ExitStack() as stack:
+        if logFile is None:
+            output: Any = subprocess.DEVNULL
+        else:
+            output = stack.enter_context(logFile.open("wb"))
+        return subprocess.Popen(
+            [f"{a}" for a in args],
+            stdin=subprocess.DEVNULL,
+            stdout=output,
+            stderr=subprocess.STDOUT,
+            **options,
+        )
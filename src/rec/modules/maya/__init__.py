@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 __author__ = "Charles Mesa Cayobit"
 
 import traceback
@@ -5,16 +7,21 @@ from collections.abc import Callable
 from contextlib import ContextDecorator
 from functools import partial, wraps
 from pathlib import Path
-from typing import Any
+from typing import Any, ClassVar, Protocol, TypeVar, runtime_checkable
 
+import maya.api.OpenMaya as om
 import maya.cmds as cmds
 import maya.standalone
 
+import rec.modules.files.names as fname
 import rec.modules.files.paths as fpath
 import rec.modules.stringEnum as strEnum
+import rec.modules.timing as mtiming
 
 _LOGS_PATH = Path(__file__).parents[3] / "logs"
 
+T = TypeVar("T")
+
 
 class FileType(strEnum.StringEnum):
     """File types accepted by Maya's cmds.file function"""
@@ -32,11 +39,96 @@ class Standalone:
         maya.standalone.uninitialize()
 
 
+def getPlaybackRange() -> tuple[float, float]:
+    """Get the start and end frames of the timeline"""
+    return (
+        cmds.playbackOptions(query=True, minTime=True),
+        cmds.playbackOptions(query=True, maxTime=True),
+    )
+
+
+def saveSnapshot(dir: Path) -> Path:
+    """Export the scene, including unsaved changes, to an ASCII file
+
+    References are preserved, so the snapshot opens like the scene does.
+    """
+
+    filePath = dir / f"{fname.SHOW}_snapshot{fname.FileExt.MAYA_ASCII}"
+    cmds.file(
+        filePath.as_posix(),
+        exportAll=True,
+        force=True,
+        options="v=0",
+        preserveReferences=True,
+        type=FileType.ASCII,
+    )
+    return filePath
+
+
 def loadPlugin(pluginName: str) -> None:
     """Quietly load a plugin"""
     cmds.loadPlugin(pluginName, quiet=True)
 
 
+class FrameProgress:
+    """Report the frames done each time the current frame changes
+
+    Exporters evaluate the timeline one frame at a time, so their progress is
+    reported without them knowing about it. `onFrame` is called with the
+    frames done and the total, e.g. `progress.emit` in a worker process.
+    """
+
+    active: ClassVar[FrameProgress | None] = None
+
+    def __init__(
+        self,
+        onFrame: Callable[[int, int], Any],
+        frameRange: tuple[float, float] | None = None,
+    ) -> None:
+        self.onFrame = onFrame
+        self.frameRange = frameRange
+        self.start = 0
+        self.total = 0
+        self._callbackId: int | None = None
+
+    def __enter__(self) -> FrameProgress:
+        start, end = self.frameRange or getPlaybackRange()
+        self.start = round(start)
+        self.total = round(end) - self.start + 1
+        self._callbackId = om.MDGMessage.addTimeChangeCallback(
+            self._onTimeChange
+        )
+        FrameProgress.active = self
+        return self
+
+    def __exit__(self, exc_type: type | None, *args: Any) -> None:
+        FrameProgress.active = None
+        if self._callbackId is not None:
+            om.MMessage.removeCallback(self._callbackId)
+            self._callbackId = None
+        if exc_type is None:
+            self.onFrame(self.total, self.total)
+
+    def _onTimeChange(self, time: om.MTime, *args: Any) -> None:
+        self.tick(time.asUnits(om.MTime.uiUnit()))
+
+    def tick(self, frame: float) -> None:
+        done = min(max(round(frame) - self.start + 1, 0), self.total)
+        self.onFrame(done, self.total)
+
+
+def tickFrame(frame: float) -> None:
+    """Report a frame to the active `FrameProgress`, e.g. from AbcExport"""
+    if FrameProgress.active is not None:
+        FrameProgress.active.tick(frame)
+
+
+def reportFrames(done: int, total: int) -> None:
+    """Report the frames done elsewhere, e.g. by worker processes"""
+    if FrameProgress.active is not None:
+        FrameProgress.active.onFrame(done, total)
+
+
 class SuspendedRedraw(ContextDecorator):
     """Temporarily disable Maya from redrawing"""
 
@@ -47,12 +139,32 @@ class SuspendedRedraw(ContextDecorator):
         cmds.refresh(suspend=False)
 
 
+@runtime_checkable
+class Pending(Protocol):
+    """Work that finishes after the call that started it returns, e.g. a
+    background job"""
+
+    def whenFinished(self, callback: Callable[[bool, str], Any]) -> None:
+        """Call back with whether the work succeeded, and a message"""
+        ...
+
+
 def logScriptEditorOutput(
-    func: Callable[[], Any], *, dir: Path = _LOGS_PATH
-) -> Callable[[], None]:
-    """Decorator for writing the script editor's output to a text file"""
-    projectPath = fpath.getProjectPath()
-    scenePath = fpath.getScenePath()
+    func: Callable[[], T], *, dir: Path = _LOGS_PATH
+) -> Callable[[], T]:
+    """Decorator for writing the script editor's output to a text file
+
+    The scene and date are queried when the function is called, so decorating
+    a function doesn't call Maya when its module is imported.
+
+    The call's timings, and those of its `timing.span`s, are written as JSON
+    lines next to the log. If `timing.PROFILE_VAR` is set, the call is also
+    profiled with cProfile.
+
+    If the function returns `Pending` work, e.g. a background job, the log
+    is only completed, and archived, once the work finishes. The call's
+    timings are marked pending, and the work's are written when it finishes.
+    """
 
     module = func.__module__
     if module == "__main__":
@@ -62,37 +174,72 @@ def logScriptEditorOutput(
     funcName = func.__name__
     fullFuncName = f"{module}.{funcName}"
 
-    filenameDate = cmds.date(format="YY-MM-DD_hh-mm-ss")
-    logFilename = f"{filenameDate}.{moduleName}.log"
-    logFilePath = dir / logFilename
-    info = (
-        f"Date: {cmds.date()}",
-        f"Project: {projectPath}",
-        f"Scene: {scenePath}",
-        f"Called: {fullFuncName}",
-    )
-
     printCmd = partial(print, sep="\n")
     divider = "", "#" * 80, ""
 
     @wraps(func)
-    def funcWithLogging() -> None:
+    def funcWithLogging() -> T:
+        filenameDate = cmds.date(format="YY-MM-DD_hh-mm-ss")
+        logFilename = f"{filenameDate}.{moduleName}.log"
+        logFilePath = dir / logFilename
+        info = (
+            f"Date: {cmds.date()}",
+            f"Project: {fpath.getProjectPath()}",
+            f"Scene: {fpath.getScenePath()}",
+            f"Called: {fullFuncName}",
+        )
+
+        timingsFile = logFilePath.with_suffix(mtiming.TIMINGS_EXT)
+        profileFile = None
+        if mtiming.isProfiling():
+            profileFile = logFilePath.with_suffix(mtiming.PROFILE_EXT)
+
+        def archive() -> None:
+            for file in logFilePath, timingsFile, profileFile:
+                if file is not None:
+                    file.rename(Path(f"{dir}/success/{file.name}"))
+
+        def finish(succeeded: bool, message: str) -> None:
+            mtiming.recordFinished(
+                fullFuncName,
+                timingsFile,
+                startTime=recorder.startTime,
+                ok=succeeded,
+            )
+            outcome = "completed" if succeeded else "raised an error"
+            with logFilePath.open("a", encoding="utf-8") as f:
+                printCmd(message, *divider, f"{fullFuncName} {outcome}", file=f)
+            if succeeded:
+                archive()
+
         fd = cmds.cmdFileOutput(open=logFilePath.as_posix())
 
         printCmd(*info, *divider)
         try:
-            func()
+            with mtiming.record(
+                fullFuncName, timingsFile, profileFile
+            ) as recorder:
+                result = func()
+                recorder.pending = isinstance(result, Pending)
         except:
             traceback.print_exc()
             printCmd(*divider, f"{fullFuncName} raised an error")
             raise
         else:
-            printCmd(
-                *divider,
-                f"{fullFuncName} completed",
-            )
-            logFilePath.rename(Path(f"{dir}/success/{logFilename}"))
+            if isinstance(result, Pending):
+                printCmd(*divider, "Running in the background...", "")
+            else:
+                printCmd(
+                    *divider,
+                    f"{fullFuncName} completed",
+                )
         finally:
             cmds.cmdFileOutput(close=fd)
 
+        if isinstance(result, Pending):
+            result.whenFinished(finish)
+        else:
+            archive()
+        return result
+
     return funcWithLogging
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+import maya.cmds as cmds
+import maya.utils
+
+import rec.modules.files.names as fname
+import rec.modules.helpers as mhelpers
+import rec.modules.maya as mapp
+import rec.modules.maya.ui as mui
+import rec.modules.workers as mworkers
+
+JOB_FILENAME = "job.json"
+STATUS_FILENAME = "status.json"
+LOG_FILENAME = "job.log"
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_JOB_SCRIPT_PATH = Path(__file__).parents[2] / "export_background.py"
+_POLL_INTERVAL = 1.0  # Seconds
+
+Status = dict[str, Any]
+
+
+def writeStatus(jobDir: Path, state: str, message: str = "") -> None:
+    status = {"state": state, "message": message, "time": time.time()}
+    file = jobDir / STATUS_FILENAME
+    tempFile = file.with_name(f"{file.name}~")
+    tempFile.write_text(json.dumps(status), encoding="utf-8")
+    os.replace(tempFile, file)
+
+
+def readStatus(jobDir: Path) -> Status | None:
+    try:
+        return json.loads((jobDir / STATUS_FILENAME).read_text("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+class Job:
+    """Export running in a mayapy process detached from the Maya session
+
+    A thread polls the job's status file, calling `onStatus` in Maya's main
+    thread whenever it changes, so it can safely update the UI. So are the
+    callbacks waiting for the job to finish.
+    """
+
+    def __init__(
+        self,
+        dir: Path,
+        process: subprocess.Popen[bytes],
+        onStatus: Callable[[Status], None],
+    ) -> None:
+        self.dir = dir
+        self.process = process
+        self.onStatus = onStatus
+        self.status: Status | None = None
+
+        self._lock = threading.Lock()
+        self._finishedCallbacks: list[Callable[[bool, str], Any]] = []
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.dir!r})"
+
+    @property
+    def logFile(self) -> Path:
+        return self.dir / LOG_FILENAME
+
+    @property
+    def isFinished(self) -> bool:
+        return self.status is not None and self.status["state"] != RUNNING
+
+    def whenFinished(self, callback: Callable[[bool, str], Any]) -> None:
+        """Call back with whether the job succeeded, and its message, once it
+        finishes"""
+
+        with self._lock:
+            if not self.isFinished:
+                self._finishedCallbacks.append(callback)
+                return
+        self._callBack(callback, self.status)  # type: ignore
+
+    def _callBack(
+        self, callback: Callable[[bool, str], Any], status: Status
+    ) -> None:
+        succeeded = status["state"] == DONE
+        maya.utils.executeDeferred(
+            partial(callback, succeeded, status.get("message", ""))
+        )
+
+    def _update(self, status: Status) -> None:
+        with self._lock:
+            self.status = status
+            callbacks = self._finishedCallbacks if self.isFinished else []
+            if callbacks:
+                self._finishedCallbacks = []
+        maya.utils.executeDeferred(partial(self.onStatus, status))
+        for callback in callbacks:
+            self._callBack(callback, status)
+
+    def _poll(self) -> None:
+        while not self.isFinished:
+            time.sleep(_POLL_INTERVAL)
+            status = readStatus(self.dir)
+            returncode = self.process.poll()
+            if returncode is not None and (
+                status is None or status["state"] == RUNNING
+            ):
+                message = f"Exited with {returncode}, see: {self.logFile}"
+                status = {"state": FAILED, "message": message}
+            if status is not None and status != self.status:
+                self._update(status)
+
+        # Keep the log and status, but not the snapshot
+        for file in self.dir.glob(f"*{fname.FileExt.MAYA_ASCII}"):
+            file.unlink(missing_ok=True)
+
+
+def reportTo(ui: mui.ProgressWindow) -> Callable[[Status], None]:
+    """Report a job's status in a progress window, if it's still open"""
+
+    def onStatus(status: Status) -> None:
+        isOpen = cmds.window(ui.name, exists=True)
+        if status["state"] == RUNNING:
+            print(status["message"])
+        elif status["state"] == DONE:
+            if isOpen:
+                ui.update()
+        else:
+            cmds.warning(f"Background export failed: {status['message']}")
+            if isOpen:
+                ui.fail(status["message"])
+
+    return onStatus
+
+
+def submit(
+    target: Callable[..., Any],
+    onStatus: Callable[[Status], None],
+    **kwargs: Any,
+) -> Job:
+    """Export in the background, from a snapshot of the scene
+
+    The target function is called in a mayapy process with the keyword
+    arguments, which must be JSON serializable. The Maya session is free as
+    soon as the snapshot is saved.
+    """
+
+    jobDir = Path(tempfile.mkdtemp(prefix=f"{fname.SHOW}_background_"))
+    scene = mapp.saveSnapshot(jobDir)
+    job = {
+        "scene": scene.as_posix(),
+        "module": target.__module__,
+        "function": target.__name__,
+        "kwargs": kwargs,
+    }
+    (jobDir / JOB_FILENAME).write_text(json.dumps(job), encoding="utf-8")
+    writeStatus(jobDir, RUNNING, message="Waiting for Maya to start")
+
+    process = mhelpers.start(
+        (mworkers.getMayapyPath(), _JOB_SCRIPT_PATH, jobDir),
+        logFile=jobDir / LOG_FILENAME,
+    )
+    return Job(jobDir, process=process, onStatus=onStatus)
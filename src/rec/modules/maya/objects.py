@@ -2,11 +2,12 @@ from __future__ import annotations
 
 __author__ = "Charles Mesa Cayobit"
 
-from collections.abc import Sequence
-from functools import partial
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Mapping, Sequence
 from pathlib import Path
-from typing import Any
+from typing import Any, Union
 
+import maya.api.OpenMaya as om
 import maya.cmds as cmds
 
 import rec.modules.files.names as fname
@@ -64,10 +65,8 @@ class TemporarySelection:
 
 def lsSelectedGeometry() -> list[DAGNode] | None:
     selection = cmds.ls(selection=True, transforms=True)
-    hasShape = partial(
-        cmds.listRelatives, shapes=True, noIntermediate=True, type="mesh"
-    )
-    return [s for s in selection if hasShape(s)] or None
+    shapes = getChildShapes(selection, type="mesh")
+    return [s for s, meshes in zip(selection, shapes) if meshes] or None
 
 
 class NoGeometrySelectedError(Exception):
@@ -114,3 +113,316 @@ def constructNamespace(filename: str, assetType: fname.TypeIdentifier) -> str:
     """Construct a namespace based an asset's filename and type"""
     cutoff = filename.index(assetType) + len(assetType)
     return filename[:cutoff]
+
+
+################################################################################
+# Batched queries
+################################################################################
+
+Plug = str  # Formatted 'node.attribute'
+PlugValue = Union[bool, int, float, str]
+Connection = tuple[Plug, Plug]  # Source and destination
+Undo = Callable[[], None]
+
+
+class SceneBackend(ABC):
+    """Queries and edits of many nodes at once, in one pass each
+
+    Looping over nodes with one `cmds` call each parses a command per node,
+    which adds up over thousands of nodes.
+    """
+
+    @abstractmethod
+    def getSourcePlugs(self, plugs: Sequence[Plug]) -> list[Plug | None]:
+        """Get the plug connected into each plug, if any"""
+
+    @abstractmethod
+    def getConnectedNodes(
+        self, nodes: Sequence[DGNode], type: str | None = None
+    ) -> list[list[DGNode]]:
+        """Get the nodes connected to each node, in either direction"""
+
+    @abstractmethod
+    def getChildShapes(
+        self,
+        nodes: Sequence[DAGNode],
+        type: str | None = None,
+        noIntermediate: bool = True,
+    ) -> list[list[ShapeNode]]:
+        """Get the shapes parented directly under each node"""
+
+    @abstractmethod
+    def edit(
+        self,
+        connections: Sequence[Connection] = (),
+        values: Mapping[Plug, PlugValue] | None = None,
+    ) -> Undo:
+        """Connect plugs and set values as one edit, returning its undo
+
+        A destination's existing connection is replaced. Undoing restores
+        every connection and value exactly as it was.
+        """
+
+
+def _isType(node: om.MObject, type: str | None) -> bool:
+    return type is None or om.MFnDependencyNode(node).typeName == type
+
+
+def _setPlugValue(
+    modifier: om.MDGModifier, plug: om.MPlug, value: PlugValue
+) -> None:
+    if isinstance(value, bool):
+        modifier.newPlugValueBool(plug, value)
+    elif isinstance(value, int):
+        modifier.newPlugValueInt(plug, value)
+    elif isinstance(value, float):
+        modifier.newPlugValueDouble(plug, value)
+    else:
+        modifier.newPlugValueString(plug, value)
+
+
+def _getName(node: om.MObject) -> DGNode:
+    if node.hasFn(om.MFn.kDagNode):
+        return om.MFnDagNode(node).partialPathName()
+    return om.MFnDependencyNode(node).name()
+
+
+class OpenMayaBackend(SceneBackend):
+    """Batched queries through the Maya API
+
+    Node types are matched exactly, unlike `cmds`, which also matches types
+    derived from them. Edits are made by one MDGModifier, which isn't on
+    Maya's undo queue, so they're undone through the returned function.
+    """
+
+    @staticmethod
+    def _select(names: Sequence[str]) -> list[om.MSelectionList]:
+        """Resolve each name, once, to a selection list of its own
+
+        In one list, names of the same node, e.g. a short name and a full
+        path, would be merged, pairing the later names with other nodes.
+        """
+
+        selections: dict[str, om.MSelectionList] = {}
+        for name in names:
+            if name in selections:
+                continue
+            selection = om.MSelectionList()
+            selection.add(name)
+            if selection.length() != 1:
+                raise ValueError(
+                    f"{name!r} matches {selection.length()} objects, not one"
+                )
+            selections[name] = selection
+        return [selections[n] for n in names]
+
+    def getSourcePlugs(self, plugs: Sequence[Plug]) -> list[Plug | None]:
+        sources = []
+        for selection in self._select(plugs):
+            source = selection.getPlug(0).source()
+            sources.append(None if source.isNull else source.name())
+        return sources
+
+    def getConnectedNodes(
+        self, nodes: Sequence[DGNode], type: str | None = None
+    ) -> list[list[DGNode]]:
+        connectedNodes = []
+        for selection in self._select(nodes):
+            connected: dict[DGNode, None] = {}  # Ordered, without duplicates
+            fn = om.MFnDependencyNode(selection.getDependNode(0))
+            for plug in fn.getConnections():
+                for other in plug.connectedTo(True, True):
+                    if _isType(other.node(), type):
+                        connected[_getName(other.node())] = None
+            connectedNodes.append(list(connected))
+        return connectedNodes
+
+    def getChildShapes(
+        self,
+        nodes: Sequence[DAGNode],
+        type: str | None = None,
+        noIntermediate: bool = True,
+    ) -> list[list[ShapeNode]]:
+        childShapes = []
+        for selection in self._select(nodes):
+            path = selection.getDagPath(0)
+            shapes = []
+            for c in range(path.childCount()):
+                child = path.child(c)
+                if not child.hasFn(om.MFn.kShape) or not _isType(child, type):
+                    continue
+                if noIntermediate and om.MFnDagNode(child).isIntermediateObject:
+                    continue
+                shapes.append(_getName(child))
+            childShapes.append(shapes)
+        return childShapes
+
+    def edit(
+        self,
+        connections: Sequence[Connection] = (),
+        values: Mapping[Plug, PlugValue] | None = None,
+    ) -> Undo:
+        values = values or {}
+        plugs = [p for c in connections for p in c] + list(values)
+        getPlug = (selection.getPlug(0) for selection in self._select(plugs))
+
+        modifier = om.MDGModifier()
+        for _ in connections:
+            source, destination = next(getPlug), next(getPlug)
+            current = destination.source()
+            if not current.isNull:
+                if current == source:
+                    continue
+                modifier.disconnect(current, destination)
+            modifier.connect(source, destination)
+        for value in values.values():
+            _setPlugValue(modifier, next(getPlug), value)
+
+        try:
+            modifier.doIt()
+        except RuntimeError:
+            modifier.undoIt()
+            raise
+        return modifier.undoIt
+
+
+def _restore(current: dict[Plug, Any], orig: dict[Plug, Any]) -> None:
+    for plug, value in orig.items():
+        if value is None:
+            current.pop(plug, None)
+        else:
+            current[plug] = value
+
+
+class StubBackend(SceneBackend):
+    """In-memory scene, for developing and benchmarking without Maya
+
+    Counts the calls made to it, i.e. the round trips that would be made to
+    Maya.
+    """
+
+    def __init__(self) -> None:
+        self.types: dict[DGNode, str] = {}
+        self.children: dict[DAGNode, list[DAGNode]] = {}
+        self.connections: dict[DGNode, dict[DGNode, None]] = {}
+        self.sources: dict[Plug, Plug] = {}
+        self.values: dict[Plug, PlugValue] = {}
+        self.calls = 0
+
+    def createNode(
+        self, name: DGNode, type: str, parent: DAGNode | None = None
+    ) -> DGNode:
+        self.types[name] = type
+        self.connections[name] = {}
+        if parent is not None:
+            self.children.setdefault(parent, []).append(name)
+        return name
+
+    def connectAttr(self, source: Plug, destination: Plug) -> None:
+        sourceNode = source.split(".", 1)[0]
+        destinationNode = destination.split(".", 1)[0]
+        self.sources[destination] = source
+        self.connections[sourceNode][destinationNode] = None
+        self.connections[destinationNode][sourceNode] = None
+
+    def getSourcePlugs(self, plugs: Sequence[Plug]) -> list[Plug | None]:
+        self.calls += 1
+        return [self.sources.get(p) for p in plugs]
+
+    def getConnectedNodes(
+        self, nodes: Sequence[DGNode], type: str | None = None
+    ) -> list[list[DGNode]]:
+        self.calls += 1
+        return [
+            [
+                c
+                for c in self.connections[n]
+                if type is None or self.types[c] == type
+            ]
+            for n in nodes
+        ]
+
+    def getChildShapes(
+        self,
+        nodes: Sequence[DAGNode],
+        type: str | None = None,
+        noIntermediate: bool = True,
+    ) -> list[list[ShapeNode]]:
+        self.calls += 1
+
+        def isShape(node: DAGNode) -> bool:
+            if type is not None and self.types[node] != type:
+                return False
+            isIntermediate = self.values.get(f"{node}.intermediateObject")
+            return not (noIntermediate and isIntermediate)
+
+        return [
+            [c for c in self.children.get(n, ()) if isShape(c)] for n in nodes
+        ]
+
+    def edit(
+        self,
+        connections: Sequence[Connection] = (),
+        values: Mapping[Plug, PlugValue] | None = None,
+    ) -> Undo:
+        self.calls += 1
+        values = values or {}
+        origSources = {d: self.sources.get(d) for _, d in connections}
+        origValues = {p: self.values.get(p) for p in values}
+
+        for source, destination in connections:
+            self.connectAttr(source, destination)
+        self.values.update(values)
+
+        def undo() -> None:
+            self.calls += 1
+            _restore(self.sources, origSources)
+            _restore(self.values, origValues)
+
+        return undo
+
+
+_backend: SceneBackend = OpenMayaBackend()
+
+
+def setBackend(backend: SceneBackend) -> SceneBackend:
+    """Use another backend for batched queries, returning the previous one"""
+
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+
+def getSourcePlugs(plugs: Sequence[Plug]) -> list[Plug | None]:
+    return _backend.getSourcePlugs(plugs)
+
+
+def getConnectedNodes(
+    nodes: Sequence[DGNode], type: str | None = None
+) -> list[list[DGNode]]:
+    return _backend.getConnectedNodes(nodes, type=type)
+
+
+def getChildShapes(
+    nodes: Sequence[DAGNode],
+    type: str | None = None,
+    noIntermediate: bool = True,
+) -> list[list[ShapeNode]]:
+    return _backend.getChildShapes(
+        nodes, type=type, noIntermediate=noIntermediate
+    )
+
+
+def edit(
+    connections: Sequence[Connection] = (),
+    values: Mapping[Plug, PlugValue] | None = None,
+) -> Undo:
+    return _backend.edit(connections, values=values)
+
+
+def setAttrs(plugs: Sequence[Plug], value: PlugValue) -> Undo:
+    return _backend.edit(values=dict.fromkeys(plugs, value))
+
+
+def connectAttrs(connections: Sequence[Connection]) -> Undo:
+    return _backend.edit(connections)
@@ -10,6 +10,7 @@ import maya.cmds as cmds
 import maya.mel as mel
 
 import rec.modules.files.names as fname
+import rec.modules.progress as mprogress
 
 
 def setDefaultFileBrowserDir(dir: Path) -> None:
@@ -58,7 +59,13 @@ class Window(ABC):
 
 
 class ProgressWindow(Window):
-    """A window with a prgress bar"""
+    """A window with a prgress bar
+
+    Besides advancing a task at a time, the bar can advance a frame at a time
+    within a task, showing the frames' throughput and time left.
+    """
+
+    _STEPS_PER_TASK = 100
 
     def __init__(self, name: str, title: str) -> None:
         super().__init__(name, title=title)
@@ -66,6 +73,8 @@ class ProgressWindow(Window):
         self.progressBar: str
         self.tasks: Iterator[str]
         self.tasksDone = 0
+        self.currentTask = ""
+        self.tracker: mprogress.Tracker | None = None
 
     def build(self) -> ProgressWindow:
         super().build()
@@ -98,7 +107,11 @@ class ProgressWindow(Window):
         return self
 
     def initialize(self, *tasks: str) -> ProgressWindow:
-        cmds.progressBar(self.progressBar, edit=True, maxValue=len(tasks))
+        cmds.progressBar(
+            self.progressBar,
+            edit=True,
+            maxValue=len(tasks) * self._STEPS_PER_TASK,
+        )
         self.tasks = iter(tasks)
 
         return self
@@ -106,9 +119,13 @@ class ProgressWindow(Window):
     def update(self) -> ProgressWindow:
         def update(currentTask: str) -> None:
             print(currentTask, end="\n")
+            self.currentTask = currentTask
+            self.tracker = None
             cmds.text(self.text, edit=True, label=currentTask)
             cmds.progressBar(
-                self.progressBar, edit=True, progress=self.tasksDone
+                self.progressBar,
+                edit=True,
+                progress=self.tasksDone * self._STEPS_PER_TASK,
             )
 
         try:
@@ -121,3 +138,30 @@ class ProgressWindow(Window):
             self.tasksDone += 1
 
         return self
+
+    def trackFrames(self, total: int) -> mprogress.Tracker:
+        """Track the frames of the current task, e.g. from several workers"""
+        self.tracker = mprogress.Tracker(total, onReport=self._showFrames)
+        return self.tracker
+
+    def reportFrames(self, done: int, total: int) -> None:
+        """Show the frames done of the current task, e.g. by an exporter"""
+        if self.tracker is None or self.tracker.total != total:
+            self.trackFrames(total)
+        self.tracker.update(done)  # type: ignore
+
+    def _showFrames(self, tracker: mprogress.Tracker) -> None:
+        if not cmds.window(self.name, exists=True):
+            return
+        label = f"{self.currentTask}\n{tracker.describe()}"
+        cmds.text(self.text, edit=True, label=label)
+        tasksDone = max(self.tasksDone - 1, 0) + tracker.fraction
+        cmds.progressBar(
+            self.progressBar,
+            edit=True,
+            progress=round(tasksDone * self._STEPS_PER_TASK),
+        )
+
+    def fail(self, message: str) -> ProgressWindow:
+        cmds.text(self.text, edit=True, label=f"Failed: {message}")
+        return self
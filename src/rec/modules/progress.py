@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import json
+import sys
+import time
+from collections.abc import Callable, Hashable
+from typing import NamedTuple, TextIO
+
+# Worker processes print progress events as lines starting with this prefix,
+# among the rest of their output
+PREFIX = "@rec-progress "
+
+DEFAULT_INTERVAL = 0.25  # Seconds between reports
+
+
+class Event(NamedTuple):
+    """Frames done out of the frames a worker has to export"""
+
+    done: int
+    total: int
+
+
+def formatEvent(event: Event) -> str:
+    return f"{PREFIX}{json.dumps(event._asdict())}"
+
+
+def parse(line: str) -> Event | None:
+    """Parse a line of a worker's output, if it's a progress event"""
+
+    if not line.startswith(PREFIX):
+        return None
+    try:
+        event = json.loads(line[len(PREFIX) :])
+        return Event(int(event["done"]), int(event["total"]))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def emit(done: int, total: int, file: TextIO | None = None) -> None:
+    """Print a progress event for the parent process to read"""
+    print(formatEvent(Event(done, total)), file=file or sys.stdout, flush=True)
+
+
+def formatDuration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+    return f"{minutes}:{seconds:02}"
+
+
+class Tracker:
+    """Progress of frames, possibly from several sources, e.g. workers
+
+    Each source reports how many of its frames are done. `onReport` is called
+    with the tracker at most once per interval, so a UI isn't redrawn for
+    every frame.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        onReport: Callable[[Tracker], None],
+        interval: float = DEFAULT_INTERVAL,
+    ) -> None:
+        self.total = total
+        self.onReport = onReport
+        self.interval = interval
+
+        self.startTime = time.perf_counter()
+        self._lastReportTime: float | None = None
+        self._done: dict[Hashable, int] = {}
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.total!r})"
+
+    @property
+    def done(self) -> int:
+        return min(sum(self._done.values()), self.total)
+
+    @property
+    def fraction(self) -> float:
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.startTime
+
+    @property
+    def rate(self) -> float | None:
+        """Frames done per second"""
+        elapsed = self.elapsed
+        return self.done / elapsed if self.done and elapsed else None
+
+    @property
+    def eta(self) -> float | None:
+        """Seconds left, at the rate so far"""
+        rate = self.rate
+        return (self.total - self.done) / rate if rate else None
+
+    def describe(self) -> str:
+        description = f"{self.done} of {self.total} frames"
+        if (rate := self.rate) is not None:
+            description += f", {rate:.1f} frames/s"
+        if (eta := self.eta) is not None:
+            description += f", {formatDuration(eta)} left"
+        return description
+
+    def update(self, done: int, source: Hashable = None) -> None:
+        """Record how many of a source's frames are done"""
+
+        self._done[source] = done
+        now = time.perf_counter()
+        if (
+            self._lastReportTime is None
+            or now - self._lastReportTime >= self.interval
+            or self.done >= self.total
+        ):
+            self._lastReportTime = now
+            self.onReport(self)
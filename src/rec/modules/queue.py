@@ -1,9 +1,23 @@
+from __future__ import annotations
+
 __author__ = "Charles Mesa Cayobit"
 
 import csv
-from collections import deque
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
 from collections.abc import Sequence
 from pathlib import Path
+from typing import Any, NamedTuple
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
 
 
 def readTxt(file: Path) -> deque[str]:
@@ -26,3 +40,386 @@ def updateCsv(file: Path, queue: deque[Sequence[str]]) -> None:
     with file.open("w", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerows(queue)
+
+
+################################################################################
+# Job Queue
+################################################################################
+
+DEFAULT_LEASE_DURATION = 300.0  # Seconds, generous for clocks out of sync
+
+
+class FileLock:
+    """Exclusive lock on a file, held across processes
+
+    It's only held across machines on a filesystem that shares locks between
+    them, e.g. SMB or NFS, not on a synced drive like Google Drive.
+    """
+
+    def __init__(self, file: Path) -> None:
+        self.file = file
+        self._fd: int | None = None
+
+    def __enter__(self) -> None:
+        self._fd = os.open(self.file, os.O_RDWR | os.O_CREAT, 0o666)
+        if os.name == "nt":
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # Gave up after 10 seconds, so keep trying
+                    continue
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *args: Any) -> None:
+        if os.name == "nt":
+            os.lseek(self._fd, 0, os.SEEK_SET)  # type: ignore
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)  # type: ignore
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)  # type: ignore
+        os.close(self._fd)  # type: ignore
+        self._fd = None
+
+
+def getOwner() -> str:
+    """Get the name this process claims jobs under"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def getLeaseFile(leasesDir: Path, owner: str) -> Path:
+    return leasesDir / f"{owner}.lease"
+
+
+class Lease:
+    """Lease file of a process claiming jobs, renewed while the lease is held
+
+    An expired or missing lease means its owner was killed or crashed, so its
+    claimed jobs can be requeued, see `JobQueue.requeueExpired`.
+    """
+
+    def __init__(
+        self,
+        leasesDir: Path,
+        owner: str,
+        duration: float = DEFAULT_LEASE_DURATION,
+    ) -> None:
+        self.file = getLeaseFile(leasesDir, owner=owner)
+        self.heartbeatInterval = duration / 4
+        self._stopped = threading.Event()
+        self._heartbeat: threading.Thread | None = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.file!r})"
+
+    def _beat(self) -> None:
+        while not self._stopped.wait(self.heartbeatInterval):
+            try:
+                os.utime(self.file)
+            except OSError:
+                continue  # Try again on the next beat
+
+    def __enter__(self) -> Lease:
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        self.file.touch()
+        self._stopped.clear()
+        self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._stopped.set()
+        self._heartbeat.join()  # type: ignore
+        self._heartbeat = None
+        self.file.unlink(missing_ok=True)
+
+
+class Job(NamedTuple):
+    id: str
+    item: Any
+
+
+class JobQueue:
+    """Queue of jobs, shared by processes, that survives crashes
+
+    Every operation is appended to a journal as one JSON line, under a lock.
+    Each process only replays the lines other processes appended since its
+    last operation, so an operation costs the same however long the queue is.
+    Once most of the journal is finished jobs, it is compacted to a new file,
+    which atomically replaces the old one.
+
+    A job is pending, claimed, or failed. A claimed job is acked when done,
+    which removes it, or failed. A claimed or failed job can be requeued.
+    A job is claimed by an owner holding a lease in `leasesDir`, so if the
+    owner is killed, its jobs can be requeued.
+    """
+
+    COMPACT_THRESHOLD = 1000
+
+    def __init__(self, file: Path, leasesDir: Path | None = None) -> None:
+        self.file = file
+        self.leasesDir = leasesDir or file.with_name(f"{file.stem}.leases")
+        self._lock = FileLock(file.with_name(f"{file.name}.lock"))
+
+        self.pending: OrderedDict[str, Any] = OrderedDict()
+        self.claimed: dict[str, Any] = {}
+        self.failed: dict[str, Any] = {}
+        self.owners: dict[str, str] = {}
+        self.claimTimes: dict[str, float] = {}
+        self.reasons: dict[str, str] = {}
+
+        self._fileId: tuple[int, int] | None = None
+        self._offset = 0
+        self._lineCount = 0
+        self._hasPartialLine = False
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.file!r})"
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def _reset(self) -> None:
+        self.pending.clear()
+        self.claimed.clear()
+        self.failed.clear()
+        self.owners.clear()
+        self.claimTimes.clear()
+        self.reasons.clear()
+        self._offset = self._lineCount = 0
+        self._hasPartialLine = False
+
+    def _apply(self, entry: dict[str, Any]) -> None:
+        op, id = entry["op"], entry["id"]
+        if op == "enqueue":
+            self.pending[id] = entry["item"]
+        elif op == "claim":
+            self.claimed[id] = self.pending.pop(id)
+            self.claimTimes[id] = entry.get("time", 0.0)
+            if (owner := entry.get("owner")) is not None:
+                self.owners[id] = owner
+        elif op == "ack":
+            self.claimed.pop(id)
+            self.owners.pop(id, None)
+            self.claimTimes.pop(id, None)
+        elif op == "fail":
+            self.failed[id] = self.claimed.pop(id)
+            self.owners.pop(id, None)
+            self.claimTimes.pop(id, None)
+            self.reasons[id] = entry.get("reason", "")
+        elif op == "requeue":
+            item = self.claimed.pop(id, None)
+            self.pending[id] = self.failed.pop(id, item)
+            self.owners.pop(id, None)
+            self.claimTimes.pop(id, None)
+            self.reasons.pop(id, None)
+
+    def _sync(self) -> None:
+        """Replay the lines appended since the last sync"""
+
+        try:
+            stat = os.stat(self.file)
+        except FileNotFoundError:
+            self._fileId = None
+            self._reset()
+            return
+        fileId = stat.st_dev, stat.st_ino
+        if fileId != self._fileId or stat.st_size < self._offset:
+            self._fileId = fileId
+            self._reset()  # Compacted by another process
+
+        with self.file.open("rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):  # Interrupted while appending
+                    self._hasPartialLine = True
+                    break
+                self._offset += len(line)
+                self._lineCount += 1
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    continue  # Skip what an interrupted append left behind
+
+    def _append(self, *entries: dict[str, Any]) -> None:
+        lines = "".join(f"{json.dumps(e)}\n" for e in entries).encode()
+        if self._hasPartialLine:
+            lines = b"\n" + lines
+        with self.file.open("ab") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+            self._offset = f.tell()
+            if self._fileId is None:
+                stat = os.fstat(f.fileno())
+                self._fileId = stat.st_dev, stat.st_ino
+
+        for e in entries:
+            self._apply(e)
+        self._lineCount += len(entries) + self._hasPartialLine
+        self._hasPartialLine = False
+
+        live = len(self.pending) + len(self.claimed) + len(self.failed)
+        if self._lineCount > max(self.COMPACT_THRESHOLD, 4 * live):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the journal with only the jobs that aren't finished"""
+
+        entries = [
+            {"op": "enqueue", "id": id, "item": item}
+            for jobs in (self.claimed, self.failed, self.pending)
+            for id, item in jobs.items()
+        ]
+        entries += (
+            {
+                "op": "claim",
+                "id": id,
+                "owner": self.owners.get(id),
+                "time": self.claimTimes.get(id, 0.0),
+            }
+            for id in self.claimed
+        )
+        entries += ({"op": "claim", "id": id} for id in self.failed)
+        entries += (
+            {"op": "fail", "id": id, "reason": self.reasons.get(id, "")}
+            for id in self.failed
+        )
+
+        tempFile = self.file.with_name(f"{self.file.name}~")
+        with tempFile.open("w", encoding="utf-8") as f:
+            f.writelines(f"{json.dumps(e)}\n" for e in entries)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempFile, self.file)
+
+        stat = os.stat(self.file)
+        self._fileId = stat.st_dev, stat.st_ino
+        self._offset = stat.st_size
+        self._lineCount = len(entries)
+
+    def refresh(self) -> JobQueue:
+        """Catch up with the operations of other processes"""
+        with self._lock:
+            self._sync()
+        return self
+
+    def _enqueue(self, items: Sequence[Any]) -> list[str]:
+        ids = [uuid.uuid4().hex for _ in items]
+        now = time.time()
+        self._sync()
+        self._append(
+            *(
+                {"op": "enqueue", "id": id, "item": item, "time": now}
+                for id, item in zip(ids, items)
+            )
+        )
+        return ids
+
+    def enqueue(self, *items: Any) -> list[str]:
+        """Add items to the end of the queue, returning their job IDs"""
+        with self._lock:
+            return self._enqueue(items)
+
+    def claim(self, owner: str | None = None) -> Job | None:
+        """Take the job at the front of the queue, if there is one
+
+        The owner, e.g. a render node, is recorded with the claim, so its jobs
+        can be requeued if it stops responding.
+        """
+
+        with self._lock:
+            self._sync()
+            if not self.pending:
+                return None
+            id, item = next(iter(self.pending.items()))
+            entry = {"op": "claim", "id": id, "time": time.time()}
+            if owner is not None:
+                entry["owner"] = owner
+            self._append(entry)
+        return Job(id, item)
+
+    def _finish(
+        self, op: str, id: str, owner: str | None = None, **info: Any
+    ) -> None:
+        with self._lock:
+            self._sync()
+            if op == "requeue":
+                found = id in self.claimed or id in self.failed
+            else:
+                found = id in self.claimed
+            if owner is not None:
+                found = found and self.owners.get(id) == owner
+            if not found:
+                raise KeyError(f"Job {id!r} cannot be {op}ed")
+            self._append({"op": op, "id": id, "time": time.time(), **info})
+
+    def ack(self, id: str, owner: str | None = None, **info: Any) -> None:
+        """Remove a claimed job, since it is done
+
+        If an owner is given, the job must still be claimed by it. Any info,
+        e.g. how long the job took, is recorded in the journal.
+        """
+        self._finish("ack", id, owner=owner, **info)
+
+    def fail(
+        self, id: str, reason: str = "", owner: str | None = None, **info: Any
+    ) -> None:
+        """Set aside a claimed job, since it couldn't be done"""
+        self._finish("fail", id, owner=owner, reason=reason, **info)
+
+    def requeue(self, id: str) -> None:
+        """Return a claimed or failed job to the end of the queue"""
+        self._finish("requeue", id)
+
+    def lease(
+        self, owner: str, duration: float = DEFAULT_LEASE_DURATION
+    ) -> Lease:
+        """Hold a lease on the jobs an owner claims, while it works on them"""
+        return Lease(self.leasesDir, owner=owner, duration=duration)
+
+    def requeueExpired(
+        self, leaseDuration: float = DEFAULT_LEASE_DURATION
+    ) -> list[str]:
+        """Requeue the claimed jobs of owners whose leases weren't renewed
+
+        A job claimed without an owner, by older scripts, is requeued once
+        its claim is older than a lease.
+        """
+
+        self.refresh()
+        now = time.time()
+        requeued = []
+        for id in list(self.claimed):
+            owner = self.owners.get(id)
+            if owner is None:
+                if now - self.claimTimes.get(id, 0.0) < leaseDuration:
+                    continue
+            else:
+                leaseFile = getLeaseFile(self.leasesDir, owner=owner)
+                try:
+                    if now - leaseFile.stat().st_mtime < leaseDuration:
+                        continue
+                except FileNotFoundError:
+                    pass
+            try:
+                self.requeue(id)
+            except KeyError:  # The owner finished the job after all
+                continue
+            requeued.append(id)
+        return requeued
+
+    def absorbTxt(self, file: Path) -> list[str]:
+        """Move the lines of a text file queue, from older scripts, here"""
+
+        with self._lock:
+            try:
+                lines = readTxt(file)
+            except FileNotFoundError:
+                return []
+            items = [s for line in lines if (s := line.strip())]
+            if not items:
+                return []
+            ids = self._enqueue(items)
+            updateTxt(file, queue=deque())
+        return ids
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import cProfile
+import json
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, ClassVar, TextIO
+
+import rec.modules.workers as mworkers
+
+# Set to profile every logged call, e.g. REC_PROFILE=1
+PROFILE_VAR = "REC_PROFILE"
+
+TIMINGS_EXT = ".timings.jsonl"
+PROFILE_EXT = ".prof"
+
+
+class Recorder:
+    """Write the timings of a call, and its spans, as JSON lines
+
+    Each span records its wall and CPU time, and its parent, so nested steps
+    can be told apart, e.g. scanning the caches while exporting one.
+    """
+
+    active: ClassVar[Recorder | None] = None
+
+    def __init__(self, file: TextIO) -> None:
+        self.file = file
+        self.spans: list[str] = []
+        self.startTime = time.perf_counter()
+        self.pending = False  # The call started work that's still running
+
+    def write(self, **record: Any) -> None:
+        self.file.write(f"{json.dumps(record, default=str)}\n")
+        self.file.flush()
+
+
+@contextmanager
+def span(name: str, **info: Any) -> Iterator[None]:
+    """Time a named step of the call being recorded, if one is"""
+
+    recorder = Recorder.active
+    if recorder is None:
+        yield
+        return
+
+    parent = recorder.spans[-1] if recorder.spans else None
+    recorder.spans.append(name)
+    wallStart, cpuStart = time.perf_counter(), time.process_time()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        recorder.spans.pop()
+        recorder.write(
+            type="span",
+            name=name,
+            parent=parent,
+            depth=len(recorder.spans),
+            start=wallStart - recorder.startTime,
+            wall=time.perf_counter() - wallStart,
+            cpu=time.process_time() - cpuStart,
+            ok=ok,
+            **info,
+        )
+
+
+def isProfiling() -> bool:
+    return os.environ.get(PROFILE_VAR, "") not in ("", "0")
+
+
+@contextmanager
+def record(
+    function: str, timingsFile: Path, profileFile: Path | None = None
+) -> Iterator[Recorder]:
+    """Record a call's timings, and profile it if a profile file is given
+
+    The peak memory is the process's, i.e. Maya's, since it started. If the
+    recorder is marked pending, the call's record is too, and the work's
+    own record is written once it finishes, see `recordFinished`.
+    """
+
+    profiler = cProfile.Profile() if profileFile is not None else None
+    with timingsFile.open("a", encoding="utf-8") as f:
+        recorder = Recorder(f)
+        previous, Recorder.active = Recorder.active, recorder
+        wallStart, cpuStart = recorder.startTime, time.process_time()
+        ok = False
+        try:
+            if profiler is not None:
+                profiler.enable()
+            yield recorder
+            ok = True
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profileFile)
+            Recorder.active = previous
+            recorder.write(
+                type="call",
+                function=function,
+                wall=time.perf_counter() - wallStart,
+                cpu=time.process_time() - cpuStart,
+                peakMemory=mworkers.getPeakMemory(),
+                ok=ok,
+                pending=recorder.pending,
+                profile=profileFile,
+            )
+
+
+def recordFinished(
+    function: str, timingsFile: Path, startTime: float, ok: bool
+) -> None:
+    """Record how long a pending call's work took, e.g. a background job
+
+    The wall time is from the call's start, as `time.perf_counter`, to now.
+    """
+
+    with timingsFile.open("a", encoding="utf-8") as f:
+        Recorder(f).write(
+            type="call",
+            function=function,
+            wall=time.perf_counter() - startTime,
+            ok=ok,
+            pending=False,
+        )
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+from queue import Empty, SimpleQueue
+from typing import NamedTuple, Union
+
+import rec.modules.progress as mprogress
+import rec.modules.queue as mqueue
+
+if os.name != "nt":
+    import resource
+
+Arg = Union[str, Path]
+
+_POLL_INTERVAL = 0.1  # Seconds between reading the workers' progress
+
+
+def getMayapyPath() -> str:
+    return os.path.join(os.environ["MAYA_LOCATION"], "bin", "mayapy")
+
+
+def getDefaultWorkerCount() -> int:
+    """Leave one core for the artist's session or the parent process"""
+    return max((os.cpu_count() or 2) - 1, 1)
+
+
+def getPeakMemory() -> int | None:
+    """Get the most memory this process has used, in bytes
+
+    Windows doesn't report it, so None is returned.
+    """
+
+    if os.name == "nt":
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux: KiB
+
+
+class Result(NamedTuple):
+    """Output of a finished worker process"""
+
+    args: tuple[str, ...]
+    returncode: int
+    stdout: str
+    stderr: str
+
+    @property
+    def succeeded(self) -> bool:
+        return self.returncode == 0
+
+    def print(self) -> None:
+        print(
+            "",
+            " ".join(self.args),
+            "stdout:",
+            self.stdout,
+            "",
+            "stderr:",
+            self.stderr,
+            sep="\n",
+        )
+
+
+def _run(
+    args: Sequence[Arg],
+    onProgress: Callable[[mprogress.Event], None] | None = None,
+) -> Result:
+    """Run a command, passing its progress events on as it prints them"""
+
+    args = tuple(f"{a}" for a in args)
+    process = subprocess.Popen(
+        args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+
+    # Read stderr alongside stdout, so neither pipe fills up and blocks
+    stderr: list[str] = []
+    stderrReader = threading.Thread(
+        target=lambda: stderr.extend(process.stderr),  # type: ignore
+        daemon=True,
+    )
+    stderrReader.start()
+
+    stdout = []
+    for line in process.stdout:  # type: ignore
+        event = mprogress.parse(line)
+        if event is None:
+            stdout.append(line)
+        elif onProgress is not None:
+            onProgress(event)
+    returncode = process.wait()
+    stderrReader.join()
+    return Result(args, returncode, "".join(stdout), "".join(stderr))
+
+
+def run(
+    commands: Sequence[Sequence[Arg]],
+    maxWorkers: int | None = None,
+    onDone: Callable[[Result], None] | None = None,
+    onProgress: Callable[[int, mprogress.Event], None] | None = None,
+) -> list[Result]:
+    """Run each command in its own process, several at a time
+
+    `onDone` is called from the calling thread as each process finishes, so it
+    can safely update Maya's UI. So is `onProgress`, with the command's index,
+    for each progress event a process prints. The results are returned in
+    command order.
+    """
+
+    if maxWorkers is None:
+        maxWorkers = getDefaultWorkerCount()
+    maxWorkers = max(min(maxWorkers, len(commands)), 1)
+
+    events: SimpleQueue[tuple[int, mprogress.Event]] = SimpleQueue()
+
+    def putEvent(i: int, event: mprogress.Event) -> None:
+        events.put((i, event))
+
+    def passOnProgress() -> None:
+        while True:
+            try:
+                i, event = events.get_nowait()
+            except Empty:
+                return
+            if onProgress is not None:
+                onProgress(i, event)
+
+    with ThreadPoolExecutor(maxWorkers) as executor:
+        futures = {
+            executor.submit(_run, c, partial(putEvent, i)): i
+            for i, c in enumerate(commands)
+        }
+        results: list[Result | None] = [None] * len(commands)
+        running = set(futures)
+        while running:
+            finished, running = wait(
+                running, timeout=_POLL_INTERVAL, return_when=FIRST_COMPLETED
+            )
+            passOnProgress()
+            for future in finished:
+                result = future.result()
+                results[futures[future]] = result
+                if onDone is not None:
+                    onDone(result)
+    return results  # type: ignore
+
+
+
+def runQueue(
+    queue: mqueue.JobQueue,
+    getCommand: Callable[[mqueue.Job], Sequence[Arg]],
+    maxWorkers: int | None = None,
+    retries: int = 0,
+    onDone: Callable[[mqueue.Job, Result, int], None] | None = None,
+) -> dict[str, Result]:
+    """Run a command for each job in a queue, each in its own process
+
+    A job is only claimed once a worker is free for it, so the jobs this
+    process doesn't get to stay queued. The claims are leased to this
+    process, so if it's killed, they're requeued by the next run. A job is
+    acked as soon as its command succeeds, or retried, then failed.
+
+    `onDone` is called from the calling thread with each job, its result,
+    and the attempt. The last result of each job is returned by job ID.
+    """
+
+    if maxWorkers is None:
+        maxWorkers = getDefaultWorkerCount()
+    maxWorkers = max(maxWorkers, 1)
+
+    owner = mqueue.getOwner()
+    results: dict[str, Result] = {}
+    running: dict[Future[Result], tuple[mqueue.Job, int]] = {}
+    with queue.lease(owner), ThreadPoolExecutor(maxWorkers) as executor:
+
+        def submit(job: mqueue.Job, attempt: int) -> None:
+            future = executor.submit(_run, getCommand(job))
+            running[future] = job, attempt
+
+        while True:
+            while len(running) < maxWorkers:
+                job = queue.claim(owner=owner)
+                if job is None:
+                    break
+                submit(job, attempt=1)
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job, attempt = running.pop(future)
+                result = results[job.id] = future.result()
+                if onDone is not None:
+                    onDone(job, result, attempt)
+                if result.succeeded:
+                    queue.ack(job.id, owner=owner)
+                elif attempt <= retries:
+                    submit(job, attempt=attempt + 1)
+                else:
+                    queue.fail(
+                        job.id,
+                        reason=f"Worker exited with {result.returncode}",
+                        owner=owner,
+                    )
+    return results
+
+
+def writeLog(logFile: Path, result: Result) -> Path:
+    """Write a finished process's command, return code, and output"""
+
+    logFile.parent.mkdir(exist_ok=True)
+    with logFile.open("w", encoding="utf-8") as f:
+        print(
+            " ".join(result.args),
+            f"Return code: {result.returncode}",
+            "",
+            "stdout:",
+            result.stdout,
+            "",
+            "stderr:",
+            result.stderr,
+            sep="\n",
+            file=f,
+        )
+    return logFile
+
+
+def runSceneQueue(
+    queue: mqueue.JobQueue,
+    script: Arg,
+    logsDir: Path,
+    logSuffix: str,
+    label: str,
+    maxWorkers: int | None = None,
+    retries: int = 0,
+) -> bool:
+    """Run a mayapy script on each queued scene, like `runQueue`, then report
+
+    The script is passed '--scene' and the scene. Each attempt is logged to
+    '<date>.<scene>.<attempt>.<logSuffix>.log' in the logs directory. The
+    report counts the scenes whose `label`, e.g. 'caches', were exported, and
+    lists the failed ones with their last log. Returns whether all succeeded.
+    """
+
+    scenes: dict[str, Path] = {}
+    logs: dict[str, Path] = {}
+
+    def onDone(job: mqueue.Job, result: Result, attempt: int) -> None:
+        scene = scenes[job.id] = Path(job.item)
+        date = time.strftime("%y-%m-%d_%H-%M-%S")
+        logFile = logsDir / f"{date}.{scene.stem}.{attempt}.{logSuffix}.log"
+        logs[job.id] = writeLog(logFile, result=result)
+        print(f"{'Exported' if result.succeeded else 'Failed'}: {scene.name}")
+
+    results = runQueue(
+        queue,
+        lambda job: (getMayapyPath(), script, "--scene", job.item),
+        maxWorkers=maxWorkers,
+        retries=retries,
+        onDone=onDone,
+    )
+
+    failed = [id for id, r in results.items() if not r.succeeded]
+    print(
+        "",
+        "#" * 80,
+        "",
+        f"Exported the {label} of {len(results) - len(failed)} of"
+        f" {len(results)} shots",
+        *(f"  Failed: {scenes[id].name} (log: {logs[id]})" for id in failed),
+        "",
+        sep="\n",
+    )
+    return not failed
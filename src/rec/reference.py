@@ -124,10 +124,17 @@ def character(
     parent(geometry, parent=characterGrp)
 
 
-getModelPathCmd = partial(
-    fpath.findModelPath,
-    parentDir=fpath.findSharedDrive(directory=fpath.ASSETS_DIR),
-)
+def getModelPath(assetName: fname.NameIdentifier) -> Path:
+    """Get the path to the model's master file
+
+    The assets drive is only looked up when this is first called, not when
+    this module is imported.
+    """
+
+    assetsDir = fpath.findSharedDrive(directory=fpath.ASSETS_DIR)
+    return fpath.findModelPath(assetName, parentDir=assetsDir)
+
+
 _constructNamespaceCmd = partial(
     mobj.constructNamespace, assetType=fname.AssetType.MODEL
 )
@@ -135,7 +142,7 @@ _constructNamespaceCmd = partial(
 
 @mapp.logScriptEditorOutput
 def mechanicModel() -> None:
-    file = getModelPathCmd(fname.AssetName.MECHANIC)
+    file = getModelPath(fname.AssetName.MECHANIC)
     namespace = _constructNamespaceCmd(file.stem)
     character(
         file,
@@ -146,7 +153,7 @@ def mechanicModel() -> None:
 
 @mapp.logScriptEditorOutput
 def robotModel() -> None:
-    file = getModelPathCmd(fname.AssetName.ROBOT)
+    file = getModelPath(fname.AssetName.ROBOT)
     namespace = _constructNamespaceCmd(file.stem)
     character(
         file,
@@ -1,10 +1,12 @@
 #!/Applications/Autodesk/maya2023/Maya.app/Contents/bin/mayapy
 """Construct the args needed to batch render with Cmd or Zsh"""
 
+from __future__ import annotations
+
 __author__ = "Charles Mesa Cayobit"
 
 import os
-import shutil
+import re
 import sys
 from pathlib import Path
 
@@ -12,61 +14,98 @@ _SCRIPTS_DIR = Path(__file__).parents[1]
 sys.path.insert(0, f"{_SCRIPTS_DIR}")
 
 import rec.modules.files.paths as fpath
+import rec.modules.frames as mframes
 import rec.modules.queue as mqueue
 
 ARGS_FILE = _SCRIPTS_DIR / "__render_args.cmd"
 
-RENDER_QUEUE = _SCRIPTS_DIR / "__render_queue.txt"
+RENDER_QUEUE = _SCRIPTS_DIR / "__render_queue.jsonl"
+LEGACY_RENDER_QUEUE = _SCRIPTS_DIR / "__render_queue.txt"
 FAILED_TO_RENDER = _SCRIPTS_DIR / "__render_failed.txt"
 
 
-def main() -> None:
-    shutil.copy(RENDER_QUEUE, f"{RENDER_QUEUE}~")
-
-    queue = mqueue.readTxt(RENDER_QUEUE)
-    while True:
-        try:
-            scene = queue.popleft().strip()
-        except IndexError:  # Queue is empty
-            sys.exit(1)  # Break out of the while loop in Cmd / Zsh
-        if os.path.isfile(scene):
-            scene = Path(scene)
-            break
-        mqueue.updateTxt(RENDER_QUEUE, queue=queue)
-        with FAILED_TO_RENDER.open("a", encoding="utf8") as f:
-            print(scene, file=f)
+def constructArgs(
+    scene: Path,
+    frameRange: mframes.FrameRange | None = None,
+    firstFrame: int | None = None,
+) -> tuple[str, ...]:
+    """Construct the args for rendering a scene with Arnold or Flair
+
+    Arnold can render part of the shot, numbering the images from the shot's
+    first frame. Flair is given the part through the environment instead,
+    see `rec.renderSettings.constructFrameRangeEnv`.
+    """
 
     mayaPath = os.path.join(os.environ["MAYA_LOCATION"], "bin")
     if "arnold" in scene.stem:
-        args = (
-            f'"{os.path.join(mayaPath, "Render")}"',
+        if frameRange is None:
+            partArgs = ()
+        else:
+            start, end = frameRange
+            first = start if firstFrame is None else firstFrame
+            partArgs = (
+                "-s",
+                f"{start}",
+                "-e",
+                f"{end}",
+                "-rfs",
+                f"{1 + start - first}",
+            )
+        return (
+            os.path.join(mayaPath, "Render"),
             "-renderer",
             "arnold",
             "-proj",
-            f'"{fpath.findSharedDrive().as_posix()}"',
+            fpath.findSharedDrive().as_posix(),
             "-ai:threads",
             "-1",
             "-ai:aerr",
             "true",
             "-ai:alf",
             "true",
-            f'"{scene}"',
+            *partArgs,
+            f"{scene}",
         )
-    else:
-        args = (
-            f'"{os.path.join(mayaPath, "mayabatch")}"',
-            "-file",
-            f'"{scene}"',
-            "-proj",
-            f'"{fpath.findSharedDrive().as_posix()}"',
-            "-command",
-            '"python(\\"import rec.renderFlair\\")"',
-            "-noAutoloadPlugins",
-        )
-    with ARGS_FILE.open("w", encoding="utf-8") as f:
-        print(*args, file=f)
+    return (
+        os.path.join(mayaPath, "mayabatch"),
+        "-file",
+        f"{scene}",
+        "-proj",
+        fpath.findSharedDrive().as_posix(),
+        "-command",
+        'python("import rec.renderFlair; rec.renderFlair.main()")',
+        "-noAutoloadPlugins",
+    )
+
+
+def _quote(arg: str) -> str:
+    """Quote paths and commands for Cmd / Zsh"""
+    if re.fullmatch(r"[\w:.-]+", arg):
+        return arg
+    return '"{}"'.format(arg.replace('"', '\\"'))
+
+
+def main() -> None:
+    queue = mqueue.JobQueue(RENDER_QUEUE)
+    queue.absorbTxt(LEGACY_RENDER_QUEUE)
+    queue.requeueExpired()  # Of earlier runs that were killed
+    owner = mqueue.getOwner()
+    with queue.lease(owner):
+        while True:
+            job = queue.claim(owner=owner)
+            if job is None:  # Queue is empty
+                sys.exit(1)  # Break out of the while loop in Cmd / Zsh
+            if os.path.isfile(job.item):
+                scene = Path(job.item)
+                break
+            queue.fail(job.id, reason="Scene not found", owner=owner)
+            with FAILED_TO_RENDER.open("a", encoding="utf8") as f:
+                print(job.item, file=f)
+
+        with ARGS_FILE.open("w", encoding="utf-8") as f:
+            print(*map(_quote, constructArgs(scene)), file=f)
 
-    mqueue.updateTxt(RENDER_QUEUE, queue=queue)
+        queue.ack(job.id, owner=owner)  # Cmd / Zsh renders the scene from here
 
 
 if __name__ == "__main__":
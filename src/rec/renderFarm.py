@@ -0,0 +1,231 @@
+#!/Applications/Autodesk/maya2023/Maya.app/Contents/bin/mayapy
+"""Render queued scenes on several machines sharing the render drive
+
+Dispatch the render queue to the farm, optionally splitting each scene into
+chunks of frames, then start a worker on each machine:
+    renderFarm.py --queue-dir /Volumes/farm dispatch --chunks 4 [--resume]
+    renderFarm.py --queue-dir /Volumes/farm work
+
+The queue's folder must be on a network share whose file locks are shared
+between machines, e.g. SMB or NFS. A synced drive, like Google Drive, copies
+files between machines without their locks, so two nodes could claim the
+same job.
+"""
+
+from __future__ import annotations
+
+__author__ = "Charles Mesa Cayobit"
+
+import contextlib
+import os
+import subprocess
+import sys
+import uuid
+from argparse import ArgumentParser
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+_SCRIPTS_DIR = Path(__file__).parents[1]
+sys.path.insert(0, f"{_SCRIPTS_DIR}")
+
+import maya.cmds as cmds
+
+import rec.modules.farm as mfarm
+import rec.modules.files.names as fname
+import rec.modules.files.sequences as fseq
+import rec.modules.frames as mframes
+import rec.modules.maya as mapp
+import rec.modules.queue as mqueue
+import rec.renderArgs
+import rec.renderSettings
+
+
+def render(item: str | dict[str, Any]) -> int:
+    """Render a scene, or part of it, in a separate process
+
+    Returns the process's exit code.
+    """
+
+    if isinstance(item, str):
+        scene, frameRange, firstFrame, env = Path(item), None, None, None
+    else:
+        scene = Path(item["scene"])
+        frameRange, firstFrame = (item["start"], item["end"]), item["first"]
+        env = {
+            **os.environ,
+            **rec.renderSettings.constructFrameRangeEnv(frameRange),
+        }
+
+    if not scene.is_file():
+        print(f"Scene not found: {scene}", file=sys.stderr)
+        return 1
+    args = rec.renderArgs.constructArgs(
+        scene, frameRange=frameRange, firstFrame=firstFrame
+    )
+    results = subprocess.run(
+        args, env=env, stdout=sys.stdout, stderr=sys.stderr
+    )
+    return results.returncode
+
+
+def readFrameRange(scene: Path) -> tuple[float, float] | None:
+    """Open a scene, without its references, to read its cache's frame range"""
+
+    cmds.file(
+        scene.as_posix(), open=True, force=True, loadReferenceDepth="none"
+    )
+    return rec.renderSettings.getCacheFrameRange()
+
+
+def findUnrenderedFrameRanges(
+    scene: Path, frameRange: mframes.FrameRange
+) -> list[mframes.FrameRange]:
+    """Find the frames of the open scene whose images are missing"""
+
+    if "arnold" in scene.stem:
+        sequenceDir, name = rec.renderSettings.getArnoldSequence()
+    else:
+        shot = fname.ShotId.fromFilename(scene.stem)
+        sequenceDir, name = rec.renderSettings.getFlairSequence(shot)
+    return fseq.findUnrenderedFrameRanges(
+        sequenceDir, name=name, frameRange=frameRange
+    )
+
+
+def splitScene(
+    scene: str, chunks: int = 1, resume: bool = False
+) -> list[str | dict[str, Any]]:
+    """Split a scene into jobs that each render a chunk of its frames
+
+    If resuming, only the frames whose images are missing are rendered, split
+    between the chunks. The chunks share a group, so the farm records when
+    the whole shot is done.
+    """
+
+    if (chunks <= 1 and not resume) or not os.path.isfile(scene):
+        return [scene]
+    cacheFrameRange = readFrameRange(Path(scene))
+    if cacheFrameRange is None:  # No cache to get the frame range from
+        return [scene]
+    frameRange = mframes.toWholeFrames(*cacheFrameRange)
+
+    if not resume:
+        toRender = [frameRange]
+    elif not (toRender := findUnrenderedFrameRanges(Path(scene), frameRange)):
+        print(f"Already rendered: {scene}")
+        return []
+
+    # Give each range of missing frames its share of the chunks
+    frameCount = sum(end - start + 1 for start, end in toRender)
+    frameRanges = [
+        chunk
+        for start, end in toRender
+        for chunk in mframes.split(
+            start, end, count=round(chunks * (end - start + 1) / frameCount)
+        )
+    ]
+    group = f"{Path(scene).stem}.{uuid.uuid4().hex[:8]}"
+    return [
+        {
+            "scene": scene,
+            "start": start,
+            "end": end,
+            "first": frameRange[0],
+            "group": group,
+            "chunk": i,
+            "chunks": len(frameRanges),
+        }
+        for i, (start, end) in enumerate(frameRanges)
+    ]
+
+
+def dispatch(
+    queueDir: Path, scenes: list[Path], chunks: int = 1, resume: bool = False
+) -> None:
+    """Move the local render queue, and any other scenes, to the farm
+
+    Each scene can be split into chunks of frames, rendered by separate
+    workers, and only its missing frames can be rendered. Either requires
+    opening the scene to read its frame range.
+    """
+
+    queue = mqueue.JobQueue(rec.renderArgs.RENDER_QUEUE)
+    queue.absorbTxt(rec.renderArgs.LEGACY_RENDER_QUEUE)
+    queue.requeueExpired()  # Of earlier runs that were killed
+    owner = mqueue.getOwner()
+    jobs = [(None, s.as_posix()) for s in scenes]
+
+    items: list[str | dict[str, Any]] = []
+    with queue.lease(owner):
+        jobs += (
+            (j.id, j.item) for j in iter(partial(queue.claim, owner), None)
+        )
+        try:
+            with contextlib.ExitStack() as stack:
+                if chunks > 1 or resume:
+                    stack.enter_context(mapp.Standalone())
+                for _, scene in jobs:
+                    items += splitScene(scene, chunks=chunks, resume=resume)
+
+            mfarm.dispatch(queueDir, items)
+        except:
+            # Give the local queue its scenes back, to dispatch again
+            for id, _ in jobs:
+                if id is not None:
+                    queue.requeue(id)
+            raise
+        for id, _ in jobs:
+            if id is not None:
+                queue.ack(id, owner=owner, dispatchedTo=f"{queueDir}")
+    print(f"Dispatched {len(jobs)} scenes as {len(items)} jobs to: {queueDir}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--queue-dir",
+        type=Path,
+        required=True,
+        help="Folder of the farm's queue, on a network share with shared "
+        "file locks, e.g. SMB or NFS, not a synced drive like Google Drive",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    dispatchParser = subparsers.add_parser("dispatch")
+    dispatchParser.add_argument("scenes", nargs="*", type=Path)
+    dispatchParser.add_argument(
+        "-c",
+        "--chunks",
+        type=int,
+        default=1,
+        help="Number of workers to split each scene's frames between",
+    )
+    dispatchParser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Only render frames whose images are missing or incomplete",
+    )
+
+    workParser = subparsers.add_parser("work")
+    workParser.add_argument(
+        "--lease",
+        type=float,
+        default=mfarm.DEFAULT_LEASE_DURATION,
+        help="Seconds without a heartbeat before a node's job is reclaimed",
+    )
+    workParser.add_argument(
+        "--keep-running",
+        action="store_true",
+        help="Wait for new jobs when the queue is empty",
+    )
+    args = parser.parse_args()
+
+    queueDir = args.queue_dir
+    if args.command == "dispatch":
+        dispatch(
+            queueDir, args.scenes, chunks=args.chunks, resume=args.resume
+        )
+    else:
+        worker = mfarm.Worker(queueDir, render=render, leaseDuration=args.lease)
+        sys.exit(1 if worker.run(keepRunning=args.keep_running) else 0)
@@ -1,9 +1,42 @@
+"""Render the open scene using Flair
+
+Importing this module doesn't render. Call main(), e.g. from mayabatch:
+python("import rec.renderFlair; rec.renderFlair.main()")
+
+To resume a render, set the REC_RENDER_RESUME environment variable. Only the
+frames whose images are missing or incomplete are rendered.
+"""
+
+__author__ = "Charles Mesa Cayobit"
+
+import math
+
 import flair
 import flair_render as fr
 
+import rec.modules.files.names as fname
+import rec.modules.files.paths as fpath
+import rec.modules.files.sequences as fseq
+import rec.modules.frames as mframes
+import rec.modules.maya as mapp
 import rec.renderSettings
 
 
+def findUnrenderedFrameRanges() -> list[mframes.FrameRange]:
+    """Find the frames to render whose images are missing or incomplete"""
+
+    shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
+    sequenceDir, sequenceName = rec.renderSettings.getFlairSequence(shot)
+    frameRange = mframes.toWholeFrames(*mapp.getPlaybackRange())
+    cacheFrameRange = rec.renderSettings.getCacheFrameRange() or frameRange
+    return fseq.findUnrenderedFrameRanges(
+        sequenceDir,
+        name=sequenceName,
+        frameRange=frameRange,
+        firstFrame=math.floor(cacheFrameRange[0]),
+    )
+
+
 def main() -> None:
     rec.renderSettings.setGlobals()
     rec.renderSettings.setFlair()
@@ -12,7 +45,16 @@ def main() -> None:
 
     renderer = fr.Renderer(alpha="Premult.", img_format=".png", taa=True)  # type: ignore
     renderer.set_folders(scene_folder=False)
-    renderer.render()
 
+    if not rec.renderSettings.isResuming():
+        renderer.render()
+        return
 
-main()
+    cacheFrameRange = rec.renderSettings.getCacheFrameRange()
+    firstFrame = None if cacheFrameRange is None else cacheFrameRange[0]
+    for startFrame, endFrame in findUnrenderedFrameRanges():
+        print(f"Rendering frames {startFrame}-{endFrame}")
+        rec.renderSettings.setFrameRange(
+            startFrame, endFrame, firstFrame=firstFrame
+        )
+        renderer.render()
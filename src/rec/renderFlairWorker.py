@@ -0,0 +1,97 @@
+#!/Applications/Autodesk/maya2023/Maya.app/Contents/bin/mayapy
+"""Render queued scenes with Flair in one long-lived Maya session
+
+Maya is initialized and Flair is loaded once, then each scene is opened,
+rendered, and closed. Memory grows over many scenes, so the worker exits with
+RECYCLE_EXIT_CODE after enough scenes or memory, to be started again by
+renderNoArnold.py.
+"""
+
+__author__ = "Charles Mesa Cayobit"
+
+import os
+import socket
+import sys
+import traceback
+from argparse import ArgumentParser
+from pathlib import Path
+
+_SCRIPTS_DIR = Path(__file__).parents[1]
+sys.path.insert(0, f"{_SCRIPTS_DIR}")
+
+import maya.cmds as cmds
+
+import rec.modules.maya as mapp
+import rec.modules.queue as mqueue
+import rec.modules.workers as mworkers
+
+RECYCLE_EXIT_CODE = 75
+
+DEFAULT_MAX_SCENES = 20
+DEFAULT_MAX_MEMORY = 16 * 1024**3  # Bytes
+
+
+def getName(pid: int) -> str:
+    """Get the name a worker claims jobs under"""
+    return f"{socket.gethostname()}-{pid}-flair"
+
+
+def renderScene(scene: Path) -> None:
+    import rec.renderFlair
+
+    cmds.file(scene.as_posix(), open=True, force=True)
+    try:
+        rec.renderFlair.main()
+    finally:
+        cmds.file(new=True, force=True)
+        cmds.flushUndo()
+
+
+def main(queueFile: Path, maxScenes: int, maxMemory: int) -> int:
+    """Render scenes until the queue is empty, or the process is recycled"""
+
+    import rec.renderFlair  # Flair needs Maya initialized, then loads once
+
+    queue = mqueue.JobQueue(queueFile)
+    name = getName(os.getpid())
+    sceneCount = 0
+    with queue.lease(name):
+        while (job := queue.claim(owner=name)) is not None:
+            scene = Path(job.item)
+            print("", f"Rendering: {scene}", sep="\n")
+            try:
+                if not scene.is_file():
+                    raise FileNotFoundError(scene)
+                renderScene(scene)
+            except Exception as e:
+                traceback.print_exc()
+                queue.fail(job.id, reason=f"{e}", owner=name)
+            else:
+                queue.ack(job.id, owner=name)
+
+            sceneCount += 1
+            peakMemory = mworkers.getPeakMemory() or 0
+            if sceneCount >= maxScenes or peakMemory >= maxMemory:
+                print(
+                    f"Recycling after {sceneCount} scenes,"
+                    f" using up to {peakMemory / 1024**3:.1f} GiB"
+                )
+                return RECYCLE_EXIT_CODE
+    return 0
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("queue", type=Path)
+    parser.add_argument("--max-scenes", type=int, default=DEFAULT_MAX_SCENES)
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        default=DEFAULT_MAX_MEMORY,
+        help="Bytes of memory used before recycling",
+    )
+    args = parser.parse_args()
+
+    with mapp.Standalone():
+        returncode = main(args.queue, args.max_scenes, args.max_memory)
+    sys.exit(returncode)
@@ -4,9 +4,9 @@
 __author__ = "Charles Mesa Cayobit"
 
 import os
-import shutil
 import subprocess
 import sys
+from argparse import ArgumentParser
 from functools import partial
 from pathlib import Path
 
@@ -15,50 +15,170 @@ sys.path.insert(0, f"{_SCRIPTS_DIR}")
 
 import rec.modules.files.paths as fpath
 import rec.modules.queue as mqueue
+import rec.modules.workers as mworkers
+import rec.renderFlairWorker
+import rec.renderSettings
 
-RENDER_QUEUE = _SCRIPTS_DIR / "__render_queue.txt"
+RENDER_QUEUE = _SCRIPTS_DIR / "__render_queue.jsonl"
+LEGACY_RENDER_QUEUE = _SCRIPTS_DIR / "__render_queue.txt"
 FAILED_TO_RENDER = _SCRIPTS_DIR / "__render_failed.txt"
 
-MAYA_PATH = os.path.join(os.environ["MAYA_LOCATION"], "bin", "mayabatch")
+_WORKER_SCRIPT_PATH = Path(__file__).with_name("renderFlairWorker.py")
+_MAX_CRASHES = 3  # In a row, before giving up on the queue
 
 
-def render(scene: Path) -> None:
+def getMayabatchPath() -> str:
+    return os.path.join(os.environ["MAYA_LOCATION"], "bin", "mayabatch")
+
+
+def render(scene: Path, resume: bool = False) -> int:
+    """Render a scene with Flair, optionally only its unrendered frames"""
+
+    env = {**os.environ, rec.renderSettings.RESUME_VAR: "1"} if resume else None
     args = (
-        MAYA_PATH,
+        getMayabatchPath(),
         "-batch",
         "-file",
         scene,
         "-proj",
         fpath.findSharedDrive(),
         "-command",
-        'python("import rec.renderFlair")',
+        'python("import rec.renderFlair; rec.renderFlair.main()")',
         "-noAutoloadPlugins",
     )
-    subprocess.run(args, stdout=sys.stdout, stderr=sys.stderr)
-
-
-def main() -> None:
+    results = subprocess.run(
+        args, env=env, stdout=sys.stdout, stderr=sys.stderr
+    )
+    return results.returncode
+
+
+def renderInWorkers(
+    resume: bool = False,
+    maxScenes: int = rec.renderFlairWorker.DEFAULT_MAX_SCENES,
+    maxMemory: int = rec.renderFlairWorker.DEFAULT_MAX_MEMORY,
+) -> bool:
+    """Render the queue in a long-lived Maya session, recycled as it grows
+
+    If the session crashes, its scene is marked as failed and a new session
+    carries on with the rest of the queue. If it crashes without a scene,
+    e.g. while starting up, or keeps crashing, a new session would too, so
+    the queue is left for later and False is returned.
+    """
+
+    env = {**os.environ, rec.renderSettings.RESUME_VAR: "1"} if resume else None
+    queue = mqueue.JobQueue(RENDER_QUEUE)
+    queue.absorbTxt(LEGACY_RENDER_QUEUE)
+    queue.requeueExpired()  # Of earlier runs that were killed
+    crashes = 0
+    while True:
+        args = (
+            mworkers.getMayapyPath(),
+            _WORKER_SCRIPT_PATH,
+            RENDER_QUEUE,
+            "--max-scenes",
+            f"{maxScenes}",
+            "--max-memory",
+            f"{maxMemory}",
+        )
+        process = subprocess.Popen(
+            args, env=env, stdout=sys.stdout, stderr=sys.stderr
+        )
+        returncode = process.wait()
+        if returncode == 0:
+            return True
+        elif returncode == rec.renderFlairWorker.RECYCLE_EXIT_CODE:
+            crashes = 0
+            continue
+
+        crashes += 1
+        failed = 0
+        name = rec.renderFlairWorker.getName(process.pid)
+        for id, owner in list(queue.refresh().owners.items()):
+            if owner != name:
+                continue
+            scene = queue.claimed[id]
+            queue.fail(id, reason=f"Worker exited with {returncode}")
+            with FAILED_TO_RENDER.open("a", encoding="utf8") as f:
+                print(scene, file=f)
+            failed += 1
+        mqueue.getLeaseFile(queue.leasesDir, owner=name).unlink(
+            missing_ok=True
+        )
+
+        if not failed:
+            print(
+                f"Render worker exited with {returncode} without a scene",
+                file=sys.stderr,
+            )
+            return False
+        if crashes >= _MAX_CRASHES:
+            print(
+                f"Render worker crashed {crashes} times in a row",
+                file=sys.stderr,
+            )
+            return False
+
+
+def main(resume: bool = False) -> None:
     border = partial(print, "", "#" * 80, "", sep="\n")
     border()
 
-    shutil.copy(RENDER_QUEUE, f"{RENDER_QUEUE}~")
-
     print("Starting render...", "", sep="\n")
 
-    queue = mqueue.readTxt(RENDER_QUEUE)
-    while queue:
-        scene = queue.popleft().strip()
-        if os.path.isfile(scene):
-            render(Path(scene))
-        else:
-            with FAILED_TO_RENDER.open("a", encoding="utf8") as f:
-                print(scene, file=f)
-
-        mqueue.updateTxt(RENDER_QUEUE, queue=queue)
+    queue = mqueue.JobQueue(RENDER_QUEUE)
+    queue.absorbTxt(LEGACY_RENDER_QUEUE)
+    queue.requeueExpired()  # Of earlier runs that were killed
+    owner = mqueue.getOwner()
+    with queue.lease(owner):
+        while (job := queue.claim(owner=owner)) is not None:
+            scene = job.item
+            if not os.path.isfile(scene):
+                queue.fail(job.id, reason="Scene not found", owner=owner)
+                with FAILED_TO_RENDER.open("a", encoding="utf8") as f:
+                    print(scene, file=f)
+            elif returncode := render(Path(scene), resume=resume):
+                queue.fail(
+                    job.id,
+                    reason=f"mayabatch exited with {returncode}",
+                    owner=owner,
+                )
+            else:
+                queue.ack(job.id, owner=owner)
 
     print("", "Render done!", sep="\n")
     border()
 
 
 if __name__ == "__main__":
-    main()
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Only render frames whose images are missing or incomplete",
+    )
+    parser.add_argument(
+        "--persistent",
+        action="store_true",
+        help="Render every scene in one Maya session instead of one each",
+    )
+    parser.add_argument(
+        "--max-scenes",
+        type=int,
+        default=rec.renderFlairWorker.DEFAULT_MAX_SCENES,
+        help="Scenes a persistent session renders before it's restarted",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        default=rec.renderFlairWorker.DEFAULT_MAX_MEMORY,
+        help="Bytes a persistent session uses before it's restarted",
+    )
+    args = parser.parse_args()
+
+    if args.persistent:
+        succeeded = renderInWorkers(
+            args.resume, args.max_scenes, args.max_memory
+        )
+        sys.exit(0 if succeeded else 1)
+    else:
+        main(resume=args.resume)
@@ -9,6 +9,7 @@ from typing import NoReturn
 import rec.modules.files.names as fname
 import rec.modules.files.paths as fpath
 import rec.modules.maya as mapp
+import rec.modules.queue as mqueue
 import rec.renderArgs
 
 
@@ -25,5 +26,4 @@ def main() -> None | NoReturn:
         message = f"File {scene.name!r} is not a Maya scene"
         raise fname.InvalidFilenameError(message)
 
-    with rec.renderArgs.RENDER_QUEUE.open("a", encoding="utf-8") as f:
-        print(scene.as_posix(), file=f)
+    mqueue.JobQueue(rec.renderArgs.RENDER_QUEUE).enqueue(scene.as_posix())
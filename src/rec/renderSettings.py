@@ -4,7 +4,9 @@ from __future__ import annotations
 
 __author__ = "Charles Mesa Cayobit"
 
+import os
 from functools import partial
+from pathlib import Path
 from typing import Any, ClassVar
 
 import maya.cmds as cmds
@@ -15,8 +17,57 @@ import rec.modules.files.paths as fpath
 import rec.modules.maya as mapp
 
 
+START_FRAME_VAR = "REC_RENDER_START_FRAME"
+END_FRAME_VAR = "REC_RENDER_END_FRAME"
+RESUME_VAR = "REC_RENDER_RESUME"
+
+_ARNOLD_IMAGES_DIR = "images"
+
+
+def getCacheFrameRange() -> tuple[float, float] | None:
+    """Get the frame range of the first geometry cache in the scene
+
+    Shots whose caches were all exported in a single pass only have Alembic
+    caches, so the first Alembic cache's range is used if there are no
+    geometry caches.
+    """
+
+    if caches := cmds.ls(type="cacheFile"):
+        return (
+            cmds.getAttr(f"{caches[0]}.originalStart"),
+            cmds.getAttr(f"{caches[0]}.originalEnd"),
+        )
+    if caches := cmds.ls(type="AlembicNode"):
+        return (
+            cmds.getAttr(f"{caches[0]}.startFrame"),
+            cmds.getAttr(f"{caches[0]}.endFrame"),
+        )
+    return None
+
+
+def getFrameRangeOverride() -> tuple[float, float] | None:
+    """Get the frame range set by a render worker rendering part of a shot"""
+
+    try:
+        start, end = os.environ[START_FRAME_VAR], os.environ[END_FRAME_VAR]
+    except KeyError:
+        return None
+    return float(start), float(end)
+
+
+def constructFrameRangeEnv(frameRange: tuple[float, float]) -> dict[str, str]:
+    """Construct the environment variables for rendering part of a shot"""
+    start, end = frameRange
+    return {START_FRAME_VAR: f"{start:g}", END_FRAME_VAR: f"{end:g}"}
+
+
 def setGlobals() -> None:
-    """Set global render settings"""
+    """Set global render settings
+
+    The frame range is the geometry cache's, unless a render worker was given
+    part of the shot to render.
+    """
+
     drg = "defaultRenderGlobals"
     for attribute, value in (
         ("animation", True),
@@ -28,21 +79,61 @@ def setGlobals() -> None:
     ):
         cmds.setAttr(f"{drg}.{attribute}", value)
 
-    try:
-        cache = cmds.ls(type="cacheFile")[0]
-    except IndexError:
+    cacheFrameRange = getCacheFrameRange()
+    frameRange = getFrameRangeOverride() or cacheFrameRange
+    if frameRange is None:
         cmds.warning("No geometry cache applied in the scene.")
         return
+    firstFrame = None if cacheFrameRange is None else cacheFrameRange[0]
+    setFrameRange(*frameRange, firstFrame=firstFrame)
+
+
+def setFrameRange(
+    startFrame: float, endFrame: float, firstFrame: float | None = None
+) -> None:
+    """Set the frames to render
+
+    If rendering part of the shot, its images are numbered as in the whole
+    shot, which starts at `firstFrame`.
+    """
+
+    drg = "defaultRenderGlobals"
+    if firstFrame is not None:
+        startExtension = 1 + startFrame - firstFrame
+        cmds.setAttr(f"{drg}.startExtension", startExtension)
 
-    startFrame = cmds.getAttr(f"{cache}.originalStart")
     cmds.playbackOptions(minTime=startFrame, animationStartTime=startFrame)
     cmds.setAttr(f"{drg}.startFrame", startFrame)
 
-    endFrame = cmds.getAttr(f"{cache}.originalEnd")
     cmds.playbackOptions(maxTime=endFrame, animationEndTime=endFrame)
     cmds.setAttr(f"{drg}.endFrame", endFrame)
 
 
+def isResuming() -> bool:
+    """Check if a render should skip the frames that were already rendered"""
+    return bool(os.environ.get(RESUME_VAR))
+
+
+def getFlairSequence(shot: fname.ShotId) -> tuple[Path, str]:
+    """Get the folder and name of a shot's Flair images"""
+
+    renderDrive = fpath.findSharedDrive(directory=fpath.RENDER_GDRIVE)
+    shotDir = fpath.findShotPath(shot, parentDir=renderDrive) / "IMAGES"
+    return shotDir, shot.name.upper()
+
+
+def getArnoldSequence() -> tuple[Path, str]:
+    """Get the folder and name of the open scene's Arnold images
+
+    Arnold renders to the images folder of the project passed to Render.
+    """
+
+    prefix = cmds.getAttr("defaultRenderGlobals.imageFilePrefix")
+    prefix = prefix or fpath.getScenePath().stem
+    path = fpath.findSharedDrive() / _ARNOLD_IMAGES_DIR / prefix
+    return path.parent, path.name
+
+
 class Playblast:
     """Temporarily set playblast settings"""
 
@@ -122,12 +213,11 @@ def setFlair() -> None:
     """Set Flair render settings"""
 
     shot = fname.ShotId.fromFilename(fpath.getScenePath().stem)
-    renderDrive = fpath.findSharedDrive(directory=fpath.RENDER_GDRIVE)
-    shotDir = fpath.findShotPath(shot, parentDir=renderDrive) / "IMAGES"
+    sequenceDir, sequenceName = getFlairSequence(shot)
 
     for attribute, value in (
-        ("_sequenceDir", shotDir.as_posix()),
-        ("_sequenceName", f"{shot.name.upper()}.<###>"),
+        ("_sequenceDir", sequenceDir.as_posix()),
+        ("_sequenceName", f"{sequenceName}.<###>"),
     ):
         try:
             cmds.setAttr(f"flairGlobals.{attribute}", value, type="string")